@@ -0,0 +1,97 @@
+# Canvas rendering for the pixel art editor.
+#
+# The current frame is kept as a width x height RGB surface that is filled
+# from the palette-index array with pygame.surfarray and scaled up to the
+# pixel size in one transform. The cell grid is a pre-rendered overlay that
+# only changes with the pixel size, so redraw cost does not depend on the
+# number of cells.
+import numpy as np
+import pygame
+
+from frame_model import PALETTE_RGB
+
+GRID_COLOR = (0, 0, 0)
+# Transparent color key of the grid overlay (only ever paired with black)
+GRID_COLOR_KEY = (255, 0, 255)
+# Below this cell size the grid would cover most of the cell, so it is left out
+MIN_GRID_PIXEL_SIZE = 4
+
+
+class CanvasRenderer:
+    def __init__(self, width, height, pixel_size):
+        self.width = width
+        self.height = height
+        self.pixel_size = pixel_size
+        self.frame_surface = pygame.Surface((width, height))
+        self.grid_surface = None
+        self.scaled_surface = None
+        self.shown_surface = None  # what draw() blits: scaled_surface or a cached frame
+        self.rebuild()
+
+    def rebuild(self):
+        # Recreate the scaled surface and the grid overlay for the current pixel size
+        size = (self.width * self.pixel_size, self.height * self.pixel_size)
+        self.scaled_surface = pygame.Surface(size)
+        self.grid_surface = self.render_grid(size)
+        self.compose()
+
+    def set_pixel_size(self, pixel_size):
+        # Change the cell size, rebuilding the cached grid only when it changed
+        if pixel_size != self.pixel_size:
+            self.pixel_size = pixel_size
+            self.rebuild()
+
+    def render_grid(self, size):
+        # Pre-render the 1px border that each cell gets on all four sides
+        # (None for cells too small to carry a border)
+        if self.pixel_size < MIN_GRID_PIXEL_SIZE:
+            return None
+        def border_mask(length):
+            offsets = np.arange(length) % self.pixel_size
+            return (offsets == 0) | (offsets == self.pixel_size - 1)
+
+        mask = border_mask(size[0])[:, np.newaxis] | border_mask(size[1])[np.newaxis, :]
+        pixels = np.empty(size + (3,), dtype=np.uint8)
+        pixels[...] = GRID_COLOR_KEY
+        pixels[mask] = GRID_COLOR
+        grid = pygame.Surface(size)
+        pygame.surfarray.blit_array(grid, pixels)
+        grid.set_colorkey(GRID_COLOR_KEY)
+        return grid
+
+    def update_frame(self, frame):
+        # Refresh the canvas from a (height, width) palette-index frame
+        # surfarray uses (x, y) indexing, hence the transpose
+        pygame.surfarray.blit_array(self.frame_surface, PALETTE_RGB[frame].transpose(1, 0, 2))
+        self.compose()
+
+    def compose(self):
+        # Scale the frame up to the pixel size and lay the grid on top
+        pygame.transform.scale(self.frame_surface, self.scaled_surface.get_size(), self.scaled_surface)
+        if self.grid_surface is not None:
+            self.scaled_surface.blit(self.grid_surface, (0, 0))
+        self.shown_surface = self.scaled_surface
+
+    def render_frame(self, frame):
+        # Render a frame into a new canvas surface without touching the shown one
+        # (used to pre-render frames for playback)
+        small = pygame.Surface((self.width, self.height))
+        pygame.surfarray.blit_array(small, PALETTE_RGB[frame].transpose(1, 0, 2))
+        surface = pygame.transform.scale(small, self.scaled_surface.get_size())
+        if self.grid_surface is not None:
+            surface.blit(self.grid_surface, (0, 0))
+        return surface
+
+    def show(self, surface):
+        # Draw a surface from render_frame instead of the current frame
+        self.shown_surface = surface
+
+    def draw(self, screen, position, area=None):
+        # Blit the canvas at position, optionally limited to a screen area
+        if area is None:
+            screen.blit(self.shown_surface, position)
+            return
+        canvas_rect = self.shown_surface.get_rect(topleft=position)
+        area = area.clip(canvas_rect)
+        if area.width and area.height:
+            screen.blit(self.shown_surface, area.topleft, area.move(-position[0], -position[1]))
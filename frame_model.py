@@ -0,0 +1,204 @@
+# Compact frame model for the pixel art editor.
+#
+# Frames are stored as (height, width) uint8 arrays of palette indices 0-7.
+# The index is the integer value of the 3-bit code used in the editor's
+# color_map ('001' -> 1 -> red), so bit 0 is red, bit 1 is green and bit 2
+# is blue. Hex strings are only used at the UI edge.
+import hashlib
+
+import numpy as np
+
+# Palette in index order (matches PixelArtEditor.color_map)
+PALETTE_HEX = (
+    '#000000',  # 0 Black
+    '#FF0000',  # 1 Red
+    '#00FF00',  # 2 Green
+    '#FFFF00',  # 3 Yellow
+    '#0000FF',  # 4 Blue
+    '#FF00FF',  # 5 Magenta
+    '#00FFFF',  # 6 Cyan
+    '#FFFFFF',  # 7 White
+)
+
+# RGB lookup table, indexed by palette index
+PALETTE_RGB = np.array([
+    (0, 0, 0),
+    (255, 0, 0),
+    (0, 255, 0),
+    (255, 255, 0),
+    (0, 0, 255),
+    (255, 0, 255),
+    (0, 255, 255),
+    (255, 255, 255),
+], dtype=np.uint8)
+
+FRAME_DTYPE = np.uint8
+
+BLACK = 0
+
+_HEX_TO_INDEX = {hex_code: index for index, hex_code in enumerate(PALETTE_HEX)}
+
+
+def color_to_index(color):
+    # Convert a hex color (any case) or a palette index to a palette index
+    if isinstance(color, str):
+        return _HEX_TO_INDEX.get(color.upper(), BLACK)
+    return int(color) & 7
+
+
+def create_frame(height, width, color=BLACK):
+    # Create a new frame filled with a single color (hex or index)
+    return np.full((height, width), color_to_index(color), dtype=FRAME_DTYPE)
+
+
+def content_key(frame):
+    # Hashable key of a frame's content (shape and hash of the pixels)
+    frame = np.ascontiguousarray(frame, dtype=FRAME_DTYPE)
+    digest = hashlib.blake2b(frame.tobytes(), digest_size=16).digest()
+    return frame.shape, digest
+
+
+class FrameStore:
+    # List of frames that share pixel storage until a frame is modified
+    #
+    # Frames with identical content are stored once, keyed by a content hash.
+    # Reading a frame returns a read-only array; edit() hands out a private,
+    # writable copy of a single frame. Private frames are folded back into the
+    # shared storage by compact(), so memory grows with the number of distinct
+    # frames rather than the total frame count.
+    def __init__(self, frames=()):
+        self._slots = []   # per position: content key (shared) or private array
+        self._blobs = {}   # content key -> read-only array
+        self._refs = {}    # content key -> number of positions using it
+        self._private_count = 0
+        self.extend(frames)
+
+    def _intern(self, frame, owned=False):
+        # Share a frame's storage with identical frames; returns its content key
+        # owned frames are private arrays of this store and need no copy
+        frame = np.ascontiguousarray(frame, dtype=FRAME_DTYPE)
+        key = content_key(frame)
+        if key in self._blobs:
+            self._refs[key] += 1
+        else:
+            blob = frame if owned else frame.copy()
+            blob.flags.writeable = False
+            self._blobs[key] = blob
+            self._refs[key] = 1
+        return key
+
+    def _release(self, slot):
+        # Drop a position's reference to shared storage
+        if not isinstance(slot, tuple):
+            self._private_count -= 1
+            return
+        self._refs[slot] -= 1
+        if not self._refs[slot]:
+            del self._refs[slot]
+            del self._blobs[slot]
+
+    def _view(self, slot):
+        if isinstance(slot, tuple):
+            return self._blobs[slot]
+        view = slot.view()
+        view.flags.writeable = False
+        return view
+
+    def __len__(self):
+        return len(self._slots)
+
+    def __getitem__(self, index):
+        # Read-only access to a frame
+        return self._view(self._slots[index])
+
+    def __setitem__(self, index, frame):
+        # Replace a frame
+        key = self._intern(frame)
+        self._release(self._slots[index])
+        self._slots[index] = key
+
+    def __iter__(self):
+        return (self._view(slot) for slot in self._slots)
+
+    def __array__(self, dtype=None, copy=None):
+        if not self._slots:
+            return np.empty((0, 0, 0), dtype=dtype or FRAME_DTYPE)
+        return np.stack(list(self)).astype(dtype or FRAME_DTYPE, copy=False)
+
+    def append(self, frame):
+        self._slots.append(self._intern(frame))
+
+    def extend(self, frames):
+        for frame in frames:
+            self.append(frame)
+
+    def insert(self, index, frame):
+        self._slots.insert(index, self._intern(frame))
+
+    def pop(self, index=-1):
+        # Remove a frame and return it (read-only)
+        frame = self[index]
+        self._release(self._slots.pop(index))
+        return frame
+
+    def content_key(self, index):
+        # Hashable key of a frame's content, or None while it is being edited
+        slot = self._slots[index]
+        return slot if isinstance(slot, tuple) else None
+
+    def duplicate(self, index, to_index=None):
+        # Add another reference to a frame's content without copying it
+        self._share(index)
+        key = self._slots[index]
+        self._refs[key] += 1
+        if to_index is None:
+            self._slots.append(key)
+        else:
+            self._slots.insert(to_index, key)
+
+    def edit(self, index):
+        # Writable array for a frame, copied out of shared storage on first write
+        slot = self._slots[index]
+        if isinstance(slot, tuple):
+            slot = self._blobs[slot].copy()
+            self._release(self._slots[index])
+            self._slots[index] = slot
+            self._private_count += 1
+        return slot
+
+    def _share(self, index):
+        # Move a private frame into shared storage
+        slot = self._slots[index]
+        if not isinstance(slot, tuple):
+            self._slots[index] = self._intern(slot, owned=True)
+            self._private_count -= 1
+
+    def compact(self):
+        # Fold modified frames back into shared, deduplicated storage
+        if not self._private_count:
+            return
+        for index in range(len(self._slots)):
+            self._share(index)
+
+    def snapshot(self):
+        # Tuple of all frames that later edits cannot change
+        # Compacting first makes every frame a read-only shared buffer, and
+        # edit() copies such buffers instead of writing to them.
+        self.compact()
+        return tuple(self)
+
+    def content_keys(self):
+        # Content keys of all frames, in order (compacts the store first)
+        self.compact()
+        return tuple(self._slots)
+
+    @property
+    def unique_count(self):
+        # Number of distinct frame buffers held in memory
+        return len(self._blobs) + self._private_count
+
+    @property
+    def nbytes(self):
+        # Pixel memory actually used by the stored frames
+        return (sum(blob.nbytes for blob in self._blobs.values())
+                + sum(slot.nbytes for slot in self._slots if not isinstance(slot, tuple)))
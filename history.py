@@ -0,0 +1,301 @@
+# Undo/redo journal for the pixel art editor.
+#
+# Entries are applied to a frame_model.FrameStore and write through its
+# edit() method.
+#
+# Every entry stores a compact delta instead of a frame snapshot: changed
+# pixel positions with their old values for strokes and fills, a lookup
+# table for palette remaps and the transform itself for invertible batch
+# transforms (shifts, flips, ...). The journal has a memory budget and
+# forgets the oldest entries first when it is exceeded.
+from collections import deque
+
+import numpy as np
+
+from frame_model import FRAME_DTYPE
+from transforms import inverse_transform, transform_frames
+
+# Rough per-entry bookkeeping cost on top of the delta arrays
+ENTRY_OVERHEAD = 128
+
+DEFAULT_BUDGET = 16 * 1024 * 1024
+
+
+def _index_dtype(size):
+    # Smallest unsigned dtype that can address size pixels
+    return np.uint16 if size <= 0xFFFF else np.uint32
+
+
+class PixelsChange:
+    # Changed pixels of one frame: flat positions plus old and new values
+    def __init__(self, frame_index, positions, before, after):
+        self.frame_index = frame_index
+        self.positions = positions
+        self.before = before
+        self.after = after
+
+    @classmethod
+    def from_frames(cls, frame_index, before, after):
+        # Diff two versions of a frame; None when nothing changed
+        before = before.reshape(-1)
+        after = after.reshape(-1)
+        positions = np.flatnonzero(before != after)
+        if not len(positions):
+            return None
+        positions = positions.astype(_index_dtype(before.size))
+        return cls(frame_index, positions, before[positions], after[positions])
+
+    @property
+    def nbytes(self):
+        return ENTRY_OVERHEAD + self.positions.nbytes + self.before.nbytes + self.after.nbytes
+
+    def undo(self, frames):
+        frames.edit(self.frame_index).reshape(-1)[self.positions] = self.before
+        return self.frame_index
+
+    def redo(self, frames):
+        frames.edit(self.frame_index).reshape(-1)[self.positions] = self.after
+        return self.frame_index
+
+
+class RemapChange:
+    # Palette remap of one frame through an 8-entry lookup table
+    #
+    # Pixels whose old color cannot be recovered from the table (several
+    # colors mapped onto one) are kept as positions and old values.
+    def __init__(self, frame_index, table, positions, before):
+        self.frame_index = frame_index
+        self.table = table
+        self.positions = positions
+        self.before = before
+
+    @classmethod
+    def from_frame(cls, frame_index, before, table):
+        # Record remapping a frame (before the remap is applied)
+        table = np.asarray(table, dtype=FRAME_DTYPE)
+        before = before.reshape(-1)
+        sources_per_target = np.bincount(table, minlength=8)
+        ambiguous = sources_per_target[table[before]] > 1
+        positions = np.flatnonzero(ambiguous).astype(_index_dtype(before.size))
+        return cls(frame_index, table, positions, before[positions])
+
+    @property
+    def nbytes(self):
+        return ENTRY_OVERHEAD + self.table.nbytes + self.positions.nbytes + self.before.nbytes
+
+    def undo(self, frames):
+        frame = frames.edit(self.frame_index).reshape(-1)
+        # Invert the table where it is one-to-one, then patch the rest
+        inverse = np.arange(8, dtype=FRAME_DTYPE)
+        inverse[self.table] = np.arange(8, dtype=FRAME_DTYPE)
+        frame[:] = inverse[frame]
+        frame[self.positions] = self.before
+        return self.frame_index
+
+    def redo(self, frames):
+        frame = frames.edit(self.frame_index)
+        frame[...] = self.table[frame]
+        return self.frame_index
+
+
+class FramesTransform:
+    # Invertible transform (see transforms.py) applied to frames start..stop-1
+    def __init__(self, start, stop, name, options):
+        self.start = start
+        self.stop = stop
+        self.name = name
+        self.options = options
+
+    @property
+    def nbytes(self):
+        return ENTRY_OVERHEAD + sum(np.asarray(value).nbytes for value in self.options.values())
+
+    def _apply(self, frames, name, options):
+        stack = np.stack([frames[index] for index in range(self.start, self.stop)])
+        for offset, frame in enumerate(transform_frames(stack, name, **options)):
+            frames[self.start + offset] = frame
+        return self.start
+
+    def undo(self, frames):
+        return self._apply(frames, *inverse_transform(self.name, **self.options))
+
+    def redo(self, frames):
+        return self._apply(frames, self.name, self.options)
+
+
+class ChangeGroup:
+    # Several entries that are undone and redone as one step
+    def __init__(self, entries):
+        self.entries = entries
+
+    @property
+    def nbytes(self):
+        return ENTRY_OVERHEAD + sum(entry.nbytes for entry in self.entries)
+
+    # Both directions return the frame index reported by the first entry
+    def undo(self, frames):
+        for entry in self.entries[:0:-1]:
+            entry.undo(frames)
+        return self.entries[0].undo(frames)
+
+    def redo(self, frames):
+        frame_index = self.entries[0].redo(frames)
+        for entry in self.entries[1:]:
+            entry.redo(frames)
+        return frame_index
+
+
+def record_transform(start, before, after, name, options):
+    # Undo entry for transforming the stack before into after, starting at frame start
+    # Transforms that cannot be inverted keep per-frame deltas: the pixels a
+    # many-to-one remap merged, or every changed pixel for other transforms
+    if inverse_transform(name, **options) is not None:
+        return FramesTransform(start, start + len(before), name, options)
+    if name == "remap":
+        entries = [RemapChange.from_frame(start + offset, old, options["table"])
+                   for offset, old in enumerate(before)]
+        return ChangeGroup(entries) if entries else None
+    entries = [PixelsChange.from_frames(start + offset, old, new)
+               for offset, (old, new) in enumerate(zip(before, after))]
+    entries = [entry for entry in entries if entry is not None]
+    return ChangeGroup(entries) if entries else None
+
+
+class FrameInsert:
+    # A frame was inserted into the frame list (add, clone, ...)
+    #
+    # Read-only frames from a FrameStore are shared storage that never
+    # changes, so they are kept by reference instead of copied.
+    def __init__(self, frame_index, frame):
+        self.frame_index = frame_index
+        self.frame = frame if not frame.flags.writeable else frame.copy()
+
+    @property
+    def nbytes(self):
+        return ENTRY_OVERHEAD + self.frame.nbytes
+
+    def undo(self, frames):
+        frames.pop(self.frame_index)
+        return min(self.frame_index, len(frames) - 1)
+
+    def redo(self, frames):
+        frames.insert(self.frame_index, self.frame)
+        return self.frame_index
+
+
+class FrameDelete(FrameInsert):
+    # A frame was removed from the frame list
+    def undo(self, frames):
+        return FrameInsert.redo(self, frames)
+
+    def redo(self, frames):
+        return FrameInsert.undo(self, frames)
+
+
+class FramesInsert:
+    # A run of frames was inserted into the frame list (generated animations, ...)
+    def __init__(self, frame_index, frames):
+        self.frame_index = frame_index
+        self.frames = [frame if not frame.flags.writeable else frame.copy() for frame in frames]
+
+    @property
+    def nbytes(self):
+        return ENTRY_OVERHEAD + sum(frame.nbytes for frame in self.frames)
+
+    def undo(self, frames):
+        for _ in self.frames:
+            frames.pop(self.frame_index)
+        return min(self.frame_index, len(frames) - 1)
+
+    def redo(self, frames):
+        for offset, frame in enumerate(self.frames):
+            frames.insert(self.frame_index + offset, frame)
+        return self.frame_index
+
+
+class StrokeRecorder:
+    # Accumulates the pixels of a mouse stroke that spans many ticks
+    def __init__(self, frame_index, color_index):
+        self.frame_index = frame_index
+        self.color_index = color_index
+        self.positions = []
+        self.before = []
+
+    def record(self, frame, flat_positions):
+        # Call before writing the new color to flat_positions
+        self.positions.append(np.asarray(flat_positions))
+        self.before.append(frame.reshape(-1)[flat_positions])
+
+    def finish(self, frame_size):
+        # Build the PixelsChange of the stroke, keeping each pixel's first old value
+        if not self.positions:
+            return None
+        positions = np.concatenate(self.positions)
+        before = np.concatenate(self.before)
+        positions, first = np.unique(positions, return_index=True)
+        before = before[first]
+        changed = before != self.color_index
+        positions = positions[changed].astype(_index_dtype(frame_size))
+        if not len(positions):
+            return None
+        after = np.full(len(positions), self.color_index, dtype=FRAME_DTYPE)
+        return PixelsChange(self.frame_index, positions, before[changed], after)
+
+
+class History:
+    # Undo/redo stacks with a memory budget (oldest entries are evicted first)
+    def __init__(self, budget=DEFAULT_BUDGET):
+        self.budget = budget
+        self.undo_stack = deque()
+        self.redo_stack = []
+        self.nbytes = 0
+
+    def push(self, entry):
+        # Record a new edit; clears everything that could be redone
+        if entry is None:
+            return
+        self.nbytes -= sum(e.nbytes for e in self.redo_stack)
+        self.redo_stack.clear()
+        self.undo_stack.append(entry)
+        self.nbytes += entry.nbytes
+        self.trim()
+
+    def trim(self):
+        # Evict the oldest entries until the journal fits the budget
+        # The newest undo entry is always kept
+        if self.nbytes > self.budget and self.redo_stack:
+            self.nbytes -= sum(e.nbytes for e in self.redo_stack)
+            self.redo_stack.clear()
+        while self.nbytes > self.budget and len(self.undo_stack) > 1:
+            self.nbytes -= self.undo_stack.popleft().nbytes
+
+    def set_budget(self, budget):
+        self.budget = budget
+        self.trim()
+
+    def clear(self):
+        self.undo_stack.clear()
+        self.redo_stack.clear()
+        self.nbytes = 0
+
+    def can_undo(self):
+        return bool(self.undo_stack)
+
+    def can_redo(self):
+        return bool(self.redo_stack)
+
+    def undo(self, frames):
+        # Revert the newest edit; returns the affected frame index or None
+        if not self.undo_stack:
+            return None
+        entry = self.undo_stack.pop()
+        self.redo_stack.append(entry)
+        return entry.undo(frames)
+
+    def redo(self, frames):
+        # Re-apply the newest undone edit; returns the affected frame index or None
+        if not self.redo_stack:
+            return None
+        entry = self.redo_stack.pop()
+        self.undo_stack.append(entry)
+        return entry.redo(frames)
@@ -0,0 +1,120 @@
+# Image import helpers: load PNG/GIF/APNG files and quantize them to the
+# 8-color palette. Only Pillow and NumPy are needed, no pygame display.
+import numpy as np
+from PIL import Image, ImageSequence
+
+from frame_model import FRAME_DTYPE, PALETTE_RGB
+
+RESAMPLE_FILTERS = {
+    "nearest": Image.NEAREST,
+    "box": Image.BOX,
+    "bilinear": Image.BILINEAR,
+    "lanczos": Image.LANCZOS,
+}
+
+IMAGE_EXTENSIONS = ('.png', '.apng', '.gif')
+
+# none: plain threshold, ordered: 4x4 Bayer matrix, floyd: Floyd-Steinberg error diffusion
+DITHER_MODES = ("none", "ordered", "floyd")
+
+BAYER_4X4 = np.array([
+    [0, 8, 2, 10],
+    [12, 4, 14, 6],
+    [3, 11, 1, 9],
+    [15, 7, 13, 5],
+])
+
+# 8-color palette repeated over all 256 entries, so whichever duplicate
+# Pillow picks, index & 7 is the palette index
+_PALETTE_IMAGE = Image.new("P", (1, 1))
+_PALETTE_IMAGE.putpalette(np.tile(PALETTE_RGB, (32, 1)).reshape(-1).tolist())
+
+
+def quantize_rgb(rgb, threshold=128):
+    # Map an (..., 3) RGB array to palette indices in one vectorized pass
+    # The palette is the corners of the RGB cube, so the nearest color is
+    # found by thresholding each channel on its own
+    on = (np.asarray(rgb)[..., :3] >= threshold).astype(FRAME_DTYPE)
+    return on[..., 0] | (on[..., 1] << 1) | (on[..., 2] << 2)
+
+
+def ordered_thresholds(height, width, threshold=128):
+    # Per-pixel channel thresholds of a tiled 4x4 Bayer matrix, centered on threshold
+    tiles = np.tile(BAYER_4X4, ((height + 3) // 4, (width + 3) // 4))[:height, :width]
+    return ((tiles + 0.5) * 16 + (threshold - 128))[..., np.newaxis]
+
+
+def floyd_steinberg(rgb):
+    # Error-diffusion dither of an (height, width, 3) array to palette indices
+    # Pillow diffuses the error in C; the palette image maps straight to indices
+    image = Image.fromarray(np.ascontiguousarray(rgb, dtype=np.uint8), "RGB")
+    quantized = image.quantize(palette=_PALETTE_IMAGE, dither=Image.Dither.FLOYDSTEINBERG)
+    return (np.asarray(quantized) & 7).astype(FRAME_DTYPE)
+
+
+def dither_rgb(rgb, dither="none", threshold=128):
+    # Map an (height, width, 3) RGB array to palette indices with a DITHER_MODES mode
+    if dither == "ordered":
+        return quantize_rgb(rgb, ordered_thresholds(rgb.shape[0], rgb.shape[1], threshold))
+    if dither == "floyd":
+        return floyd_steinberg(rgb)
+    if dither != "none":
+        raise ValueError(f"Unknown dither mode: {dither}")
+    return quantize_rgb(rgb, threshold)
+
+
+def image_to_rgb(image, width, height, resample="box"):
+    # Convert a PIL image to an (height, width, 3) uint8 array at canvas size
+    # Transparent pixels are composited onto black
+    image = image.convert("RGBA")
+    if image.size != (width, height):
+        image = image.resize((width, height), RESAMPLE_FILTERS[resample])
+    background = Image.new("RGBA", image.size, (0, 0, 0, 255))
+    background.alpha_composite(image)
+    return np.asarray(background.convert("RGB"), dtype=np.uint8)
+
+
+def iter_image_frames(image, width, height, resample="box", threshold=128, dither="none"):
+    # Yield (frame, duration_ms) for every frame of an open PIL image
+    # Frames are decoded one at a time, so long GIFs are never fully in memory
+    for frame in ImageSequence.Iterator(image):
+        rgb = image_to_rgb(frame, width, height, resample)
+        yield dither_rgb(rgb, dither, threshold), frame.info.get("duration")
+
+
+def iter_image_file(path, width, height, resample="box", threshold=128, dither="none", batch_size=16):
+    # Yield (frames, durations) batches of an image file, decoding as the caller goes
+    # frames is an (n, height, width) array; the file stays open until the last batch
+    with Image.open(path) as image:
+        frames = []
+        durations = []
+        for frame, duration in iter_image_frames(image, width, height, resample, threshold, dither):
+            frames.append(frame)
+            durations.append(duration)
+            if len(frames) == batch_size:
+                yield np.stack(frames), durations
+                frames = []
+                durations = []
+        if frames:
+            yield np.stack(frames), durations
+
+
+def image_frame_count(path):
+    # Number of frames in an image file (1 for still images)
+    with Image.open(path) as image:
+        return getattr(image, "n_frames", 1)
+
+
+def load_image_frames(path, width, height, resample="box", threshold=128, dither="none"):
+    # Load every frame of an image file as palette-index frames
+    # Returns (frames, delays) where delays is the median frame duration in ms
+    # or None for still images
+    with Image.open(path) as image:
+        frames = []
+        durations = []
+        for frame, duration in iter_image_frames(image, width, height, resample, threshold, dither):
+            frames.append(frame)
+            if duration:
+                durations.append(duration)
+    delays = int(np.median(durations)) if durations and len(frames) > 1 else None
+    return frames, delays
@@ -0,0 +1,225 @@
+# Headless benchmarks for the editor's hot paths.
+#
+# Times encoding, rendering, text, frame operations and saving on several
+# canvas sizes with the SDL dummy video driver, so it runs without a display.
+# Results are written as JSON; pass an earlier result file as --baseline to
+# flag benchmarks that got slower than --tolerance allows.
+#
+#   python jt_bench.py -o before.json
+#   python jt_bench.py --baseline before.json
+import argparse
+import contextlib
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+os.environ.setdefault("PYGAME_HIDE_SUPPORT_PROMPT", "1")
+
+import numpy as np
+import pygame
+
+from frame_model import FrameStore
+from script import PixelArtEditor
+
+DEFAULT_SIZES = "16x64,32x128,64x256"
+DEFAULT_FRAME_COUNTS = "1,100,1000"
+
+
+def measure(func, repeat=5, budget=2.0, setup=None):
+    # Run func up to repeat times (at least once, at most about budget seconds)
+    # and return timing statistics in milliseconds. setup runs untimed before each call
+    times = []
+    deadline = time.perf_counter() + budget
+    while len(times) < repeat and (not times or time.perf_counter() < deadline):
+        if setup is not None:
+            setup()
+        start = time.perf_counter()
+        func()
+        times.append((time.perf_counter() - start) * 1000)
+    return {
+        "median_ms": float(np.median(times)),
+        "min_ms": float(min(times)),
+        "runs": len(times),
+    }
+
+
+def random_frames(count, height, width, seed=0):
+    # Distinct frames of random palette indices (no storage sharing)
+    rng = np.random.default_rng(seed)
+    return rng.integers(0, 8, (count, height, width), dtype=np.uint8)
+
+
+def set_frames(editor, frames):
+    # Replace the editor's frames and show the first one
+    editor.pixel_array_frames = FrameStore(frames)
+    editor.total_frames = len(editor.pixel_array_frames)
+    editor.current_frame_index = 0
+    editor.history.clear()
+    editor.invalidate_canvas()
+    editor.update_text_display()
+
+
+def bench_size(editor, height, width, frame_counts, repeat, budget):
+    # All benchmarks for one canvas size; returns {name: stats}
+    results = {}
+    size = f"{height}x{width}"
+    editor.set_canvas_size(height, width)
+    editor.set_current_mode("animation")
+
+    def run(name, func, setup=None):
+        results[f"{name}/{size}"] = measure(func, repeat, budget, setup)
+
+    for count in frame_counts:
+        set_frames(editor, random_frames(count, height, width))
+        results[f"encode_v2/{size}/{count}"] = measure(
+            lambda: editor.get_binary_data_for_jt(True), repeat, budget)
+        results[f"encode_v1/{size}/{count}"] = measure(
+            lambda: editor.get_binary_data_for_jt(True, is_v1=True), repeat, budget)
+
+    set_frames(editor, random_frames(100, height, width))
+    run("draw_pixels", editor.draw_pixels)
+
+    def refresh_debug_view():
+        editor.update_text_display()
+        editor.refresh_text_display()
+    editor.text_display.visible = True
+    run("update_text_display", refresh_debug_view)
+    editor.text_display.visible = False
+
+    editor.text_input.set_text("Hello LED")
+    run("draw_text_on_canvas", editor.draw_text_on_canvas)
+
+    # Frame operations on the current frame, then on all frames at once
+    editor.transform_scope_dropdown.selected_option = ("frame", "frame")
+    run("shift", editor.shift_image_right)
+    run("swap", editor.swap_black_pixels)
+    run("fill", editor.handle_paint_bucket)
+    # Mostly black frame, so the fill region spans many runs
+    flood_frame = random_frames(1, height, width)[0] // 4
+
+    def reset_flood_frame():
+        editor.pixel_array_frames[0] = flood_frame
+    run("flood_fill", lambda: editor.flood_fill(0, 0, "#FFFFFF"), setup=reset_flood_frame)
+    editor.transform_scope_dropdown.selected_option = ("all", "all")
+    run("shift_all_100", editor.shift_image_right)
+    run("swap_all_100", editor.swap_black_pixels)
+    editor.transform_scope_dropdown.selected_option = ("frame", "frame")
+
+    # Saving writes into downloads/ of the working directory; the benchmark
+    # waits for the background save so it covers encoding and writing
+    def save_and_wait():
+        editor.save_jt_file()
+        editor.save_worker.wait()
+    with tempfile.TemporaryDirectory() as work_dir:
+        cwd = os.getcwd()
+        os.chdir(work_dir)
+        try:
+            run("save_jt_file_100", save_and_wait, setup=editor.save_worker.plane_cache.clear)
+            # Saving again after editing one frame only encodes that frame
+            def edit_one_frame():
+                editor.pixel_array_frames.edit(0)[0, 0] ^= 7
+            run("save_after_edit_100", save_and_wait, setup=edit_one_frame)
+        finally:
+            os.chdir(cwd)
+    return results
+
+
+def run_benchmarks(sizes, frame_counts, repeat=5, budget=2.0):
+    # Run every benchmark and return the JSON-ready report
+    # The editor's own console output goes to stderr so stdout stays valid JSON
+    results = {}
+    cwd = os.getcwd()
+    os.chdir(os.path.dirname(os.path.abspath(__file__)))  # theme.json and fonts
+    try:
+        with contextlib.redirect_stdout(sys.stderr):
+            editor = PixelArtEditor()
+            for height, width in sizes:
+                results.update(bench_size(editor, height, width, frame_counts, repeat, budget))
+    finally:
+        os.chdir(cwd)
+        pygame.quit()
+
+    return {
+        "meta": {
+            "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "pygame": pygame.version.ver,
+            "machine": platform.machine(),
+            "system": platform.system(),
+        },
+        "results": results,
+    }
+
+
+def find_regressions(report, baseline, tolerance):
+    # Benchmarks whose median time grew by more than the tolerance factor
+    regressions = []
+    old_results = baseline.get("results", {})
+    for name, stats in report["results"].items():
+        if name not in old_results:
+            continue
+        old_ms = old_results[name]["median_ms"]
+        new_ms = stats["median_ms"]
+        if new_ms > old_ms * tolerance:
+            regressions.append({"name": name, "baseline_ms": old_ms, "median_ms": new_ms,
+                                "ratio": new_ms / old_ms if old_ms else float("inf")})
+    return regressions
+
+
+def parse_sizes(text):
+    # "16x64,32x128" -> [(16, 64), (32, 128)]
+    return [tuple(int(v) for v in size.lower().split("x")) for size in text.split(",") if size]
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the pixel art editor's hot paths")
+    parser.add_argument("-o", "--output", help="write the JSON report to this file (default: stdout)")
+    parser.add_argument("--sizes", default=DEFAULT_SIZES,
+                        help=f"canvas sizes as HEIGHTxWIDTH list (default: {DEFAULT_SIZES})")
+    parser.add_argument("--frames", default=DEFAULT_FRAME_COUNTS,
+                        help=f"frame counts for the encoder benchmarks (default: {DEFAULT_FRAME_COUNTS})")
+    parser.add_argument("--repeat", type=int, default=5, help="runs per benchmark (default: 5)")
+    parser.add_argument("--budget", type=float, default=2.0,
+                        help="stop repeating a benchmark after this many seconds (default: 2)")
+    parser.add_argument("--baseline", help="earlier JSON report to compare against")
+    parser.add_argument("--tolerance", type=float, default=1.25,
+                        help="flag benchmarks slower than baseline times this factor (default: 1.25)")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    try:
+        sizes = parse_sizes(args.sizes)
+        frame_counts = [int(v) for v in args.frames.split(",") if v]
+    except ValueError:
+        print("Invalid --sizes or --frames", file=sys.stderr)
+        return 2
+
+    report = run_benchmarks(sizes, frame_counts, max(1, args.repeat), args.budget)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        report["regressions"] = find_regressions(report, baseline, args.tolerance)
+        for regression in report["regressions"]:
+            print(f"REGRESSION {regression['name']}: {regression['baseline_ms']:.2f} ms -> "
+                  f"{regression['median_ms']:.2f} ms ({regression['ratio']:.2f}x)", file=sys.stderr)
+
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+    return 1 if report.get("regressions") else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
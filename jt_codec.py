@@ -0,0 +1,299 @@
+# Encoding of palette-index frames into the .jt binary layouts.
+#
+# v2 layout (matches the JavaScript implementation): for every frame, for
+# every column, for every group of 8 rows, one byte per color plane with the
+# top row in the most significant bit. All red bytes for all frames come
+# first, then all green bytes, then all blue bytes.
+import json
+import warnings
+
+import numpy as np
+
+from frame_model import FRAME_DTYPE
+
+# Bit of the palette index that holds each color plane
+RED_BIT = 0
+GREEN_BIT = 1
+BLUE_BIT = 2
+
+# Payload bytes formatted and written at a time by write_jt_document
+DEFAULT_CHUNK_SIZE = 64 * 1024
+
+
+def _number_table():
+    # JSON text of every byte value with its ", " separator, padded to 5
+    # characters, and the mask of the characters that are not padding
+    table = np.zeros((256, 5), dtype=np.uint8)
+    keep = np.zeros((256, 5), dtype=bool)
+    for value in range(256):
+        text = f"{value}, ".encode("ascii")
+        table[value, :len(text)] = list(text)
+        keep[value, :len(text)] = True
+    return table, keep
+
+
+_NUMBER_TEXT, _NUMBER_KEEP = _number_table()
+
+
+def stack_frames(frames):
+    # Stack a single frame or a sequence of frames into an (n, height, width) array
+    stack = np.asarray(frames, dtype=FRAME_DTYPE)
+    if stack.ndim == 2:
+        stack = stack[np.newaxis]
+    return stack
+
+
+def encode_planes(frames):
+    # Encode frames into the red, green and blue v2 byte planes
+    stack = stack_frames(frames)
+    # Column-major order: (frame, column, row)
+    columns = stack.transpose(0, 2, 1)
+    planes = []
+    for bit in (RED_BIT, GREEN_BIT, BLUE_BIT):
+        bits = (columns >> bit) & 1
+        # packbits pads a trailing partial group of rows with zero bits
+        planes.append(np.packbits(bits, axis=-1, bitorder='big').reshape(-1))
+    return planes
+
+
+def encode_group_bytes(frame, col, group):
+    # Encode the red, green and blue bytes of one column and 8-row group of a frame
+    column = np.asarray(frame)[group * 8:group * 8 + 8, col]
+    return [int(np.packbits((column >> bit) & 1, bitorder='big')[0])
+            for bit in (RED_BIT, GREEN_BIT, BLUE_BIT)]
+
+
+def encode_v2(frames):
+    # Encode frames into the v2 byte layout
+    return np.concatenate(encode_planes(frames))
+
+
+def encode_v1(frames):
+    # Encode frames into the v1 layout: one byte (0-7) per pixel, row-major
+    return stack_frames(frames).reshape(-1)
+
+
+class PlaneCache:
+    # Encoded v2 planes of single frames, keyed by frame content
+    #
+    # Keys are the content keys of a frame_model.FrameStore, so a frame that
+    # was not edited since the last save keeps its key and is not encoded
+    # again. Only the frames that missed are encoded, in one batch. Entries
+    # of frames that were not part of the latest update are dropped, which
+    # bounds the cache by the size of the current animation.
+    def __init__(self):
+        self.planes = {}  # content key -> (3, frame bytes) array: red, green, blue
+        self.hits = 0
+        self.misses = 0
+
+    def update(self, frames, keys):
+        # Encode the frames that are not cached yet; keys[i] identifies frames[i]
+        missing = {}
+        for frame, key in zip(frames, keys):
+            if key not in self.planes:
+                missing.setdefault(key, frame)
+        self.hits += len(keys) - len(missing)
+        self.misses += len(missing)
+        if missing:
+            planes = np.stack(encode_planes(list(missing.values())))
+            planes = planes.reshape(3, len(missing), -1)
+            for offset, key in enumerate(missing):
+                self.planes[key] = planes[:, offset].copy()
+        live_keys = set(keys)
+        self.planes = {key: planes for key, planes in self.planes.items() if key in live_keys}
+
+    def iter_chunks(self, keys, chunk_size=DEFAULT_CHUNK_SIZE):
+        # Cached bytes of the frames in keys in v2 payload order (all red
+        # bytes, then all green, then all blue), in arrays of about chunk_size bytes
+        if not keys:
+            return
+        step = max(1, chunk_size // self.planes[keys[0]].shape[1])
+        for plane in range(3):
+            for start in range(0, len(keys), step):
+                yield np.concatenate([self.planes[key][plane] for key in keys[start:start + step]])
+
+    def clear(self):
+        self.planes.clear()
+
+
+def build_jt_document(binary_data, width, height, is_animation=False,
+                      frame_count=1, delays=250):
+    # Build the .jt JSON structure around encoded binary data
+    if not is_animation:
+        # Static image
+        return [{
+            "dataType": 1,
+            "data": {
+                "speed": 255,
+                "mode": 1,
+                "pixelHeight": height,
+                "stayTime": 3,
+                "graffitiData": binary_data,
+                "pixelWidth": width,
+                "graffitiType": 1
+            }
+        }]
+    # Animation
+    return [{
+        "dataType": 0,
+        "data": {
+            "pixelWidth": width,
+            "aniData": binary_data,
+            "frameNum": frame_count,
+            "delays": delays,
+            "aniType": 1,
+            "pixelHeight": height
+        }
+    }]
+
+
+def format_json_bytes(values):
+    # JSON text of uint8 values, each followed by ", " (as bytes)
+    values = np.asarray(values, dtype=np.uint8)
+    return _NUMBER_TEXT[values][_NUMBER_KEEP[values]].tobytes()
+
+
+def write_jt_document(f, chunks, width, height, is_animation=False,
+                      frame_count=1, delays=250, chunk_size=DEFAULT_CHUNK_SIZE):
+    # Write a .jt document to the binary file f, streaming the payload
+    #
+    # chunks are uint8 arrays that make up the graffitiData/aniData payload
+    # in order. The output is byte for byte what json.dump writes for
+    # build_jt_document, but only chunk_size payload bytes are turned into
+    # text at a time instead of the whole payload becoming a list of ints.
+    text = json.dumps(build_jt_document([], width, height, is_animation=is_animation,
+                                        frame_count=frame_count, delays=delays))
+    head, tail = text.split("[]", 1)
+    f.write(head.encode("ascii") + b"[")
+    separator = b""
+    for chunk in chunks:
+        chunk = np.asarray(chunk, dtype=np.uint8).reshape(-1)
+        for start in range(0, len(chunk), chunk_size):
+            numbers = format_json_bytes(chunk[start:start + chunk_size])
+            f.write(separator)
+            f.write(numbers[:-2])
+            separator = b", "
+    f.write(b"]" + tail.encode("ascii"))
+
+
+def decode_planes(red, green, blue, width, height):
+    # Decode red, green and blue v2 byte planes back into an index frame stack
+    groups = (height + 7) // 8
+    stack = None
+    for bit, plane in ((RED_BIT, red), (GREEN_BIT, green), (BLUE_BIT, blue)):
+        plane = np.asarray(plane, dtype=np.uint8).reshape(-1, width, groups)
+        # Unpack to (frame, column, row) and drop the padding rows
+        bits = np.unpackbits(plane, axis=-1, bitorder='big')[..., :height]
+        if stack is None:
+            stack = bits << bit
+        else:
+            stack |= bits << bit
+    return np.ascontiguousarray(stack.transpose(0, 2, 1))
+
+
+def decode_v1(data, width, height):
+    # Decode v1 data (one byte per pixel) into an index frame stack
+    return (np.asarray(data, dtype=np.uint8) & 7).reshape(-1, height, width)
+
+
+def frame_bytes_v2(width, height):
+    # Number of bytes per color plane for a single v2 frame
+    return width * ((height + 7) // 8)
+
+
+def is_v1_data(data_length, width, height, frame_count):
+    # Detect the v1 layout from the payload length (v2 wins if both fit)
+    if data_length == 3 * frame_count * frame_bytes_v2(width, height):
+        return False
+    return data_length == frame_count * width * height
+
+
+def iter_decoded_frames(data, width, height, frame_count, batch_size=64):
+    # Decode a graffitiData/aniData payload in batches of frames
+    #
+    # Yields (batch_size, height, width) stacks so the first frames are
+    # available before the rest of a large animation has been decoded.
+    data = np.asarray(data, dtype=np.uint8)
+    if is_v1_data(len(data), width, height, frame_count):
+        pixels = width * height
+        for start in range(0, frame_count, batch_size):
+            stop = min(start + batch_size, frame_count)
+            yield decode_v1(data[start * pixels:stop * pixels], width, height)
+        return
+    plane_size = frame_bytes_v2(width, height)
+    if len(data) != 3 * frame_count * plane_size:
+        raise ValueError(
+            f"Expected {3 * frame_count * plane_size} bytes for {frame_count} "
+            f"{height}x{width} frames, got {len(data)}")
+    red, green, blue = data.reshape(3, -1)
+    for start in range(0, frame_count, batch_size):
+        stop = min(start + batch_size, frame_count)
+        window = slice(start * plane_size, stop * plane_size)
+        yield decode_planes(red[window], green[window], blue[window], width, height)
+
+
+def decode_frames(data, width, height, frame_count):
+    # Decode a whole graffitiData/aniData payload into an index frame stack
+    batches = list(iter_decoded_frames(data, width, height, frame_count,
+                                       batch_size=max(frame_count, 1)))
+    if not batches:
+        return np.zeros((0, height, width), dtype=FRAME_DTYPE)
+    return np.concatenate(batches)
+
+
+def _find_int_array(text, key):
+    # Locate the [ ... ] span of an integer array value for key in JSON text
+    key_pos = text.find(f'"{key}"')
+    if key_pos < 0:
+        return None
+    start = text.find('[', key_pos)
+    end = text.find(']', start)
+    if start < 0 or end < 0:
+        return None
+    return start, end + 1
+
+
+def read_jt_file(filepath):
+    # Read a .jt file into (entry, payload)
+    #
+    # entry is the parsed JSON object of the first item with its data array
+    # left empty; payload is the graffitiData or aniData array as uint8. The
+    # large integer array is parsed straight into NumPy instead of a Python
+    # list of ints.
+    with open(filepath, 'r') as f:
+        text = f.read()
+    
+    payload = None
+    for key in ("aniData", "graffitiData"):
+        span = _find_int_array(text, key)
+        if span is None:
+            continue
+        start, end = span
+        numbers = text[start + 1:end - 1]
+        expected = numbers.count(',') + 1 if numbers.strip() else 0
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore", DeprecationWarning)
+            payload = np.fromstring(numbers, dtype=np.int64, sep=',')
+        if len(payload) != expected:
+            # Malformed numbers; let the JSON parser report the problem
+            payload = None
+            break
+        text = text[:start] + "[]" + text[end:]
+        break
+    
+    document = json.loads(text)
+    if not isinstance(document, list) or not document:
+        raise ValueError("Not a .jt file: expected a non-empty list")
+    entry = document[0]
+    data = entry.get("data", {})
+    if payload is None:
+        # Fall back to the generic JSON parse
+        payload = data.get("aniData", data.get("graffitiData", []))
+    if "aniData" in data:
+        data["aniData"] = []
+    if "graffitiData" in data:
+        data["graffitiData"] = []
+    payload = np.asarray(payload)
+    if payload.size and (payload.min() < 0 or payload.max() > 255):
+        raise ValueError("Data values out of byte range")
+    return entry, payload.astype(np.uint8)
@@ -0,0 +1,137 @@
+# Headless batch converter: PNG/GIF/APNG images to .jt files.
+#
+# Runs without pygame or pygame_gui, so it works on build machines without a
+# display. Files are converted in parallel with a process pool.
+#
+#   python jt_convert.py assets/ more.gif -o downloads
+import argparse
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from imaging import DITHER_MODES, IMAGE_EXTENSIONS, RESAMPLE_FILTERS, load_image_frames
+from jt_codec import encode_v2, write_jt_document
+from previews import DEFAULT_SCALE, PREVIEW_MODES, preview_files
+
+DEFAULT_DELAY = 250
+
+
+def find_input_files(paths):
+    # Expand the command line paths into a sorted list of image files
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            for name in sorted(os.listdir(path)):
+                if name.lower().endswith(IMAGE_EXTENSIONS):
+                    files.append(os.path.join(path, name))
+        else:
+            files.append(path)
+    return files
+
+
+def convert_file(input_path, output_dir, width, height, delay=None,
+                 static=False, resample="box", threshold=128, dither="none",
+                 previews=None, preview_scale=DEFAULT_SCALE):
+    # Convert one image file into a .jt file and return the output path
+    # previews is a PREVIEW_MODES mode for review images next to the .jt file
+    frames, file_delay = load_image_frames(input_path, width, height, resample, threshold, dither)
+    if not frames:
+        raise ValueError("no frames found")
+    is_animation = len(frames) > 1 and not static
+    if not is_animation:
+        frames = frames[:1]
+    if delay is None:
+        delay = file_delay or DEFAULT_DELAY
+
+    base_name = os.path.splitext(os.path.basename(input_path))[0]
+    output_path = os.path.join(output_dir, base_name + ".jt")
+    with open(output_path, 'wb') as f:
+        write_jt_document(
+            f, [encode_v2(frames)], width, height,
+            is_animation=is_animation,
+            frame_count=len(frames),
+            delays=delay
+        )
+    if previews:
+        base_path = os.path.join(output_dir, base_name)
+        for preview_path, write in preview_files(base_path, frames, mode=previews,
+                                                 delay=delay, scale=preview_scale):
+            with open(preview_path, 'wb') as f:
+                write(f)
+    return output_path
+
+
+def _convert_job(job):
+    # Process pool worker: never raise, report errors back to the parent
+    input_path, kwargs = job
+    try:
+        return input_path, convert_file(input_path, **kwargs), None
+    except Exception as e:
+        return input_path, None, f"{type(e).__name__}: {e}"
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Convert PNG/GIF/APNG images to .jt files")
+    parser.add_argument("inputs", nargs="+", help="image files or folders of images")
+    parser.add_argument("-o", "--output-dir", default="downloads", help="output folder (default: downloads)")
+    parser.add_argument("--size", default="16x64", help="canvas size as HEIGHTxWIDTH (default: 16x64)")
+    parser.add_argument("--delay", type=int, default=None,
+                        help="animation delay in ms (default: taken from the file, else 250)")
+    parser.add_argument("--static", action="store_true", help="only convert the first frame of animations")
+    parser.add_argument("--resample", choices=sorted(RESAMPLE_FILTERS), default="box",
+                        help="resize filter (default: box)")
+    parser.add_argument("--threshold", type=int, default=128,
+                        help="channel value at which a color component turns on (default: 128)")
+    parser.add_argument("--dither", choices=DITHER_MODES, default="none",
+                        help="dithering: ordered (Bayer) or floyd (Floyd-Steinberg) (default: none)")
+    parser.add_argument("--previews", choices=PREVIEW_MODES, default=None,
+                        help="also write review images: debug (first frame), sheet (+ contact sheet), "
+                             "preview (+ upscaled PNG/GIF) or all (default: none)")
+    parser.add_argument("--preview-scale", type=int, default=DEFAULT_SCALE,
+                        help=f"pixels per LED of upscaled previews (default: {DEFAULT_SCALE})")
+    parser.add_argument("-j", "--jobs", type=int, default=os.cpu_count(),
+                        help="number of worker processes (default: all cores)")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    try:
+        height, width = (int(v) for v in args.size.lower().split('x'))
+    except ValueError:
+        print(f"Invalid --size '{args.size}', expected HEIGHTxWIDTH", file=sys.stderr)
+        return 2
+
+    files = find_input_files(args.inputs)
+    if not files:
+        print("No input images found", file=sys.stderr)
+        return 1
+    os.makedirs(args.output_dir, exist_ok=True)
+
+    kwargs = dict(output_dir=args.output_dir, width=width, height=height,
+                  delay=args.delay, static=args.static,
+                  resample=args.resample, threshold=args.threshold, dither=args.dither,
+                  previews=args.previews, preview_scale=max(1, args.preview_scale))
+    jobs = [(path, kwargs) for path in files]
+
+    start = time.perf_counter()
+    failures = 0
+    with ProcessPoolExecutor(max_workers=max(1, args.jobs or 1)) as pool:
+        chunksize = max(1, len(jobs) // (4 * max(1, args.jobs or 1)))
+        for input_path, output_path, error in pool.map(_convert_job, jobs, chunksize=chunksize):
+            if error:
+                failures += 1
+                print(f"FAILED {input_path}: {error}", file=sys.stderr)
+            else:
+                print(f"{input_path} -> {output_path}")
+    elapsed = time.perf_counter() - start
+
+    converted = len(files) - failures
+    rate = converted / elapsed if elapsed > 0 else float('inf')
+    print(f"Converted {converted}/{len(files)} files in {elapsed:.2f}s ({rate:.1f} files/s)")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
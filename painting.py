@@ -0,0 +1,101 @@
+# Painting tools for the pixel art editor: stroke coalescing with line
+# interpolation between mouse positions, and run-based flood fill.
+import numpy as np
+
+
+def line_cells(row0, col0, row1, col1):
+    # Cells on the Bresenham-style line from (row0, col0) to (row1, col1), inclusive
+    # Returns (rows, cols) arrays; one cell per step along the major axis
+    d_row = row1 - row0
+    d_col = col1 - col0
+    steps = max(abs(d_row), abs(d_col))
+    if steps == 0:
+        return np.array([row0]), np.array([col0])
+    t = np.arange(steps + 1)
+    # Integer rounding of t * d / steps, half away from the start point
+    rows = row0 + (2 * t * d_row + steps) // (2 * steps)
+    cols = col0 + (2 * t * d_col + steps) // (2 * steps)
+    return rows, cols
+
+
+class Stroke:
+    # Collects the mouse positions of a drag and turns them into cells to paint
+    #
+    # Positions are only recorded while handling events; take_cells returns
+    # everything covered since the previous call, so a whole tick of motion
+    # events becomes one batched write.
+    def __init__(self):
+        self.last_point = None
+        self.segments = []
+
+    def add_point(self, row, col):
+        # Record a mouse position, connected to the previous one by a line
+        point = (row, col)
+        self.segments.append((self.last_point or point, point))
+        self.last_point = point
+
+    def break_line(self):
+        # Stop connecting points (mouse released or left the canvas)
+        self.last_point = None
+
+    def take_cells(self, width, height):
+        # Unique (rows, cols) covered since the last call, clipped to the canvas
+        if not self.segments:
+            return np.empty(0, dtype=np.intp), np.empty(0, dtype=np.intp)
+        lines = [line_cells(r0, c0, r1, c1) for (r0, c0), (r1, c1) in self.segments]
+        self.segments = []
+        rows = np.concatenate([rows for rows, _ in lines])
+        cols = np.concatenate([cols for _, cols in lines])
+        inside = (rows >= 0) & (rows < height) & (cols >= 0) & (cols < width)
+        flat = np.unique(rows[inside] * width + cols[inside])
+        return flat // width, flat % width
+
+
+def _row_runs(same):
+    # Label every horizontal run of True cells 1, 2, ... (0 outside runs)
+    starts = same.copy()
+    starts[:, 1:] &= ~same[:, :-1]
+    labels = np.cumsum(starts.reshape(-1)).reshape(same.shape)
+    labels[~same] = 0
+    return labels
+
+
+def flood_region(frame, row, col, connectivity=4):
+    # Boolean mask of the contiguous same-color region containing (row, col)
+    #
+    # Works on runs instead of pixels: every horizontal run of the target
+    # color gets a label, runs that touch in vertically adjacent rows (or
+    # diagonally for 8-connectivity) are joined, and the fill is every run
+    # joined to the seed's run. The joining is a union-find over all touching
+    # pairs at once, so the Python loop runs once per merge round rather
+    # than once per run.
+    frame = np.asarray(frame)
+    same = frame == frame[row, col]
+    labels = _row_runs(same)
+    
+    above, below = labels[:-1], labels[1:]
+    pairs = [(above, below)]
+    if connectivity == 8:
+        pairs += [(above[:, :-1], below[:, 1:]), (above[:, 1:], below[:, :-1])]
+    touching = [(upper > 0) & (lower > 0) for upper, lower in pairs]
+    first = np.concatenate([upper[mask] for (upper, _), mask in zip(pairs, touching)])
+    second = np.concatenate([lower[mask] for (_, lower), mask in zip(pairs, touching)])
+    
+    # Every run points at the smallest label it is known to be joined to
+    parent = np.arange(int(labels.max()) + 1)
+    while True:
+        root_first, root_second = parent[first], parent[second]
+        apart = root_first != root_second
+        if not apart.any():
+            break
+        first, second = first[apart], second[apart]
+        root_first, root_second = root_first[apart], root_second[apart]
+        np.minimum.at(parent, np.maximum(root_first, root_second),
+                      np.minimum(root_first, root_second))
+        # Point every run straight at its root
+        while True:
+            grandparent = parent[parent]
+            if np.array_equal(grandparent, parent):
+                break
+            parent = grandparent
+    return parent[labels] == parent[labels[row, col]]
@@ -0,0 +1,101 @@
+# Animation playback for the pixel art editor: frame timing against a
+# monotonic clock and a cache of pre-rendered canvas surfaces.
+import time
+
+# Memory the playback cache may use for canvas surfaces
+DEFAULT_CACHE_BUDGET = 64 * 1024 * 1024
+
+
+class PlaybackClock:
+    # Decides when the next frame is due
+    #
+    # Due times advance by exactly one delay per frame instead of being
+    # measured from the moment a frame was shown, so late ticks do not add up
+    # to drift. When a tick comes so late that several frames are due, the
+    # frames in between are skipped to stay in step with the device.
+    def __init__(self, delay_ms):
+        self.delay = 0.0
+        self.next_due = None
+        self.skipped = 0
+        self.set_delay(delay_ms)
+
+    def set_delay(self, delay_ms):
+        # Change the frame delay; the current frame keeps its start time
+        delay = max(1, int(delay_ms)) / 1000
+        if self.next_due is not None:
+            self.next_due += delay - self.delay
+        self.delay = delay
+
+    def start(self, now=None):
+        # Start timing from a freshly shown frame
+        now = time.monotonic() if now is None else now
+        self.next_due = now + self.delay
+        self.skipped = 0
+
+    def stop(self):
+        self.next_due = None
+
+    def due_frames(self, now=None):
+        # Number of frames to advance now (0 while the next frame is not due)
+        if self.next_due is None:
+            return 0
+        now = time.monotonic() if now is None else now
+        if now < self.next_due:
+            return 0
+        steps = 1 + int((now - self.next_due) // self.delay)
+        self.next_due += steps * self.delay
+        self.skipped += steps - 1
+        return steps
+
+
+class FrameSurfaceCache:
+    # Rendered canvas surfaces keyed by frame content and pixel size
+    #
+    # Keys come from FrameStore.content_key, so editing a frame gives it a
+    # new key and the old surface is simply never asked for again; prune()
+    # drops such stale entries. Once the memory budget is used up new frames
+    # are not added, which keeps a fixed part of a long loop cached instead
+    # of evicting every frame just before it is needed again.
+    def __init__(self, budget=DEFAULT_CACHE_BUDGET):
+        self.budget = budget
+        self.surfaces = {}
+        self.nbytes = 0
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def surface_bytes(surface):
+        return surface.get_width() * surface.get_height() * surface.get_bytesize()
+
+    def __contains__(self, key):
+        return key in self.surfaces
+
+    def has_room(self, size):
+        # Whether a surface of size bytes would still fit into the budget
+        return self.nbytes + size <= self.budget
+
+    def get(self, key):
+        surface = self.surfaces.get(key)
+        if surface is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return surface
+
+    def put(self, key, surface):
+        # Cache a surface if it fits into the budget
+        size = self.surface_bytes(surface)
+        if key in self.surfaces or not self.has_room(size):
+            return False
+        self.surfaces[key] = surface
+        self.nbytes += size
+        return True
+
+    def prune(self, live_keys):
+        # Drop surfaces of frame contents that are no longer in use
+        for key in [key for key in self.surfaces if key not in live_keys]:
+            self.nbytes -= self.surface_bytes(self.surfaces.pop(key))
+
+    def clear(self):
+        self.surfaces.clear()
+        self.nbytes = 0
@@ -0,0 +1,154 @@
+# Review images of frames: the 1:1 debug image of a frame, a contact sheet of
+# all frames and an upscaled preview (PNG, or an animated GIF for animations),
+# plus animated GIF and APNG export of the frame list.
+#
+# Frames go to Pillow as whole arrays of palette indices with the palette
+# attached as the image's color table, so no per-pixel calls and no RGB
+# expansion are involved; indexed PNGs are also several times faster to
+# compress than RGB ones. Only Pillow and NumPy are needed, no pygame display.
+#
+# The animation writers encode and write one frame at a time, so long
+# animations never exist in memory as a whole in image form.
+import itertools
+import math
+import struct
+import zlib
+
+import numpy as np
+from PIL import GifImagePlugin, Image
+
+from frame_model import PALETTE_RGB
+
+# Images written next to a saved .jt file:
+# debug: current frame 1:1, sheet: + contact sheet, preview: + upscaled preview, all: everything
+PREVIEW_MODES = ("debug", "sheet", "preview", "all")
+
+# Pixels per LED of upscaled previews
+DEFAULT_SCALE = 4
+
+# Animation file formats of write_animation
+ANIMATION_FORMATS = ("gif", "apng")
+
+PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+
+# Contact sheet gaps use an extra color after the 8 palette colors
+GAP_INDEX = 8
+SHEET_RGB = np.vstack([PALETTE_RGB, [(64, 64, 64)]]).astype(np.uint8)
+
+
+def upscale(frames, scale):
+    # Repeat every pixel of a frame (or a stack of frames) scale x scale times
+    frames = np.asarray(frames)
+    if scale == 1:
+        return frames
+    return frames.repeat(scale, axis=-2).repeat(scale, axis=-1)
+
+
+def palette_image(indices, scale=1, palette=SHEET_RGB):
+    # Palette image of a 2D array of color indices
+    image = Image.fromarray(np.ascontiguousarray(upscale(indices, scale), dtype=np.uint8), "L")
+    image.putpalette(palette.reshape(-1).tolist())
+    return image
+
+
+def contact_sheet(frames, columns=None, gap=1):
+    # Tile frames row by row into one index array, separated by GAP_INDEX gaps
+    # columns defaults to a roughly square sheet
+    frames = np.asarray(frames)
+    count, height, width = frames.shape
+    if columns is None:
+        columns = math.ceil(math.sqrt(count * height / width))
+    columns = max(1, min(columns, count))
+    rows = max(1, math.ceil(count / columns))
+    tiles = np.full((rows * columns, height + gap, width + gap), GAP_INDEX, dtype=np.uint8)
+    tiles[:count, :height, :width] = frames
+    grid = tiles.reshape(rows, columns, height + gap, width + gap).transpose(0, 2, 1, 3)
+    grid = grid.reshape(rows * (height + gap), columns * (width + gap))
+    return np.pad(grid, ((gap, 0), (gap, 0)), constant_values=GAP_INDEX)
+
+
+def png_writer(build_image):
+    # Writer for preview_files: build a Pillow image and save it as PNG
+    # Fast zlib level: the images are big but only read by review tools
+    return lambda f: build_image().save(f, "PNG", compress_level=1)
+
+
+def write_gif(f, frames, delay=250, scale=1):
+    # Write frames as a looping animated GIF to the binary file f
+    # The 8 colors are the GIF's global color table as is, so nothing is
+    # quantized; Pillow's GIF encoder compresses one frame at a time
+    images = (palette_image(frame, scale, PALETTE_RGB) for frame in frames)
+    first = next(images, None)
+    if first is None:
+        raise ValueError("no frames to write")
+    duration = max(10, int(delay))
+    header, _ = GifImagePlugin.getheader(first, info={"loop": 0, "duration": duration})
+    for data in header:
+        f.write(data)
+    for image in itertools.chain([first], images):
+        for data in GifImagePlugin.getdata(image, duration=duration):
+            f.write(data)
+    f.write(b";")  # trailer
+
+
+def _png_chunk(kind, data):
+    return struct.pack(">I", len(data)) + kind + data + struct.pack(">I", zlib.crc32(kind + data))
+
+
+def write_apng(f, frames, delay=250, scale=1):
+    # Write frames as a looping animated PNG to the binary file f (a plain
+    # PNG for a single frame); frames must support len()
+    # The pixels are the palette indices themselves, with the 8 colors as
+    # the PNG palette
+    count = len(frames)
+    if not count:
+        raise ValueError("no frames to write")
+    height, width = np.shape(frames[0])
+    height *= scale
+    width *= scale
+    animated = count > 1
+    f.write(PNG_SIGNATURE)
+    f.write(_png_chunk(b"IHDR", struct.pack(">IIBBBBB", width, height, 8, 3, 0, 0, 0)))
+    f.write(_png_chunk(b"PLTE", PALETTE_RGB.tobytes()))
+    if animated:
+        f.write(_png_chunk(b"acTL", struct.pack(">II", count, 0)))  # 0: loop forever
+    sequence = 0
+    for index, frame in enumerate(frames):
+        # Every row starts with filter type 0 (none)
+        rows = np.zeros((height, width + 1), dtype=np.uint8)
+        rows[:, 1:] = upscale(frame, scale)
+        data = zlib.compress(rows.tobytes())
+        if animated:
+            f.write(_png_chunk(b"fcTL", struct.pack(
+                ">IIIIIHHBB", sequence, width, height, 0, 0,
+                min(max(1, int(delay)), 0xFFFF), 1000, 0, 0)))
+            sequence += 1
+        if index == 0:
+            f.write(_png_chunk(b"IDAT", data))
+        else:
+            f.write(_png_chunk(b"fdAT", struct.pack(">I", sequence) + data))
+            sequence += 1
+    f.write(_png_chunk(b"IEND", b""))
+
+
+def write_animation(f, frames, animation_format="gif", delay=250, scale=1):
+    # Write frames in one of ANIMATION_FORMATS to the binary file f
+    if animation_format == "apng":
+        return write_apng(f, frames, delay, scale)
+    return write_gif(f, frames, delay, scale)
+
+
+def preview_files(base_path, frames, current_index=0, mode="debug", delay=250, scale=DEFAULT_SCALE):
+    # [(path, write)] for the review images of a PREVIEW_MODES mode; each
+    # write(f) renders and saves one image into a binary file, so the caller
+    # decides when (and on which thread) the work happens
+    files = [(f"{base_path}.png", png_writer(lambda: palette_image(frames[current_index])))]
+    if mode in ("sheet", "all"):
+        files.append((f"{base_path}_sheet.png", png_writer(lambda: palette_image(contact_sheet(frames)))))
+    if mode in ("preview", "all"):
+        if len(frames) > 1:
+            files.append((f"{base_path}_preview.gif", lambda f: write_gif(f, frames, delay, scale)))
+        else:
+            files.append((f"{base_path}_preview.png",
+                          png_writer(lambda: palette_image(frames[0], scale))))
+    return files
@@ -0,0 +1,97 @@
+# Per-tick timing instrumentation for the pixel art editor.
+#
+# The main loop wraps each stage in profiler.section(name); time spent in
+# sections of the same name adds up per tick. One-off operations such as
+# encoding or saving are recorded with profiler.measure(name). The last
+# ticks are kept in a ring buffer for the on-screen overlay and for dumping
+# to a JSON file.
+from collections import deque
+from contextlib import contextmanager
+import json
+import time
+
+# Ticks kept for the overlay averages and file dumps (about 5 s at 60 FPS)
+DEFAULT_HISTORY = 300
+
+
+class TickProfiler:
+    def __init__(self, history=DEFAULT_HISTORY):
+        self.ticks = deque(maxlen=history)       # (tick start, tick length ms, {section: ms})
+        self.operations = deque(maxlen=history)  # (wall time, name, ms)
+        self.current = {}
+        self.tick_start = None
+
+    def begin_tick(self):
+        # Close the previous tick and start timing a new one
+        now = time.perf_counter()
+        if self.tick_start is not None:
+            self.ticks.append((self.tick_start, (now - self.tick_start) * 1000, self.current))
+        self.tick_start = now
+        self.current = {}
+
+    @contextmanager
+    def section(self, name):
+        # Time a stage of the current tick
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = (time.perf_counter() - start) * 1000
+            self.current[name] = self.current.get(name, 0.0) + elapsed
+
+    @contextmanager
+    def measure(self, name):
+        # Time a one-off operation (encode, save, ...)
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, (time.perf_counter() - start) * 1000)
+
+    def record(self, name, elapsed):
+        # Record an operation timed elsewhere (e.g. on a worker thread)
+        self.operations.append((time.time(), name, elapsed))
+
+    def fps(self):
+        # Average ticks per second over the recorded ticks
+        total_ms = sum(length for _, length, _ in self.ticks)
+        return len(self.ticks) * 1000 / total_ms if total_ms else 0.0
+
+    def summary(self):
+        # {section: (average ms, max ms)} over the recorded ticks
+        totals = {}
+        for _, _, sections in self.ticks:
+            for name, elapsed in sections.items():
+                total, peak = totals.get(name, (0.0, 0.0))
+                totals[name] = (total + elapsed, max(peak, elapsed))
+        count = len(self.ticks) or 1
+        return {name: (total / count, peak) for name, (total, peak) in totals.items()}
+
+    def last_operations(self):
+        # Most recent duration of every recorded operation, {name: ms}
+        return {name: elapsed for _, name, elapsed in self.operations}
+
+    def overlay_lines(self):
+        # Text lines for the on-screen overlay
+        lines = [f"FPS {self.fps():5.1f}"]
+        for name, (average, peak) in sorted(self.summary().items()):
+            lines.append(f"{name:<16}{average:7.2f} ms  max {peak:7.2f}")
+        for name, elapsed in sorted(self.last_operations().items()):
+            lines.append(f"last {name:<11}{elapsed:7.2f} ms")
+        return lines
+
+    def dump(self, path):
+        # Write the recorded ticks and operations to a JSON file
+        start = self.ticks[0][0] if self.ticks else 0.0
+        report = {
+            "fps": self.fps(),
+            "summary_ms": {name: {"average": average, "max": peak}
+                           for name, (average, peak) in self.summary().items()},
+            "ticks": [{"t_ms": (tick_start - start) * 1000, "length_ms": length, "sections_ms": sections}
+                      for tick_start, length, sections in self.ticks],
+            "operations": [{"time": wall_time, "name": name, "ms": elapsed}
+                           for wall_time, name, elapsed in self.operations],
+        }
+        with open(path, "w") as f:
+            json.dump(report, f, indent=1)
+        return path
@@ -0,0 +1,198 @@
+# Background saving for the pixel art editor.
+#
+# The editor hands a SaveJob with a snapshot of its frames to a SaveWorker
+# and keeps running; the worker thread encodes and writes the files. Files
+# are written to a temporary file next to the target and renamed into place,
+# so a crash or a full disk never leaves a half-written .jt behind. Status
+# messages travel back through a queue that the main loop polls, since the
+# UI may only be touched from the main thread.
+import logging
+import os
+import queue
+import tempfile
+import threading
+import time
+
+from frame_model import content_key
+from jt_codec import PlaneCache, write_jt_document
+from previews import write_animation
+
+logger = logging.getLogger(__name__)
+
+# Process umask, read once at import: os.umask can only be read by setting
+# it, which is not safe once the save worker thread is running
+_UMASK = os.umask(0)
+os.umask(_UMASK)
+
+
+def write_atomic(path, write, binary=False):
+    # Write a file through write(f) into a temporary file, then rename it to path
+    directory = os.path.dirname(path) or "."
+    os.makedirs(directory, exist_ok=True)
+    fd, temp_path = tempfile.mkstemp(dir=directory, prefix=".", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb" if binary else "w") as f:
+            write(f)
+        # mkstemp creates the file as 0600; give it the mode open() would
+        # (os.chmod rather than os.fchmod, which Windows lacks)
+        os.chmod(temp_path, 0o666 & ~_UMASK)
+        os.replace(temp_path, path)
+    except BaseException:
+        try:
+            os.unlink(temp_path)
+        except OSError:
+            pass
+        raise
+    return path
+
+
+class SaveJob:
+    # Everything needed to write one .jt file and its review images
+    #
+    # frames must not change after the job is created; the editor passes the
+    # read-only arrays of a compacted FrameStore, which are never written to.
+    # keys are the frames' FrameStore content keys for the encode cache;
+    # previews are (path, write) pairs from previews.preview_files.
+    kind = "jt"
+
+    def __init__(self, path, frames, width, height, is_animation=False, delays=250,
+                 keys=None, previews=()):
+        self.path = path
+        self.frames = tuple(frames)
+        self.keys = tuple(keys) if keys is not None else tuple(content_key(frame) for frame in self.frames)
+        self.width = width
+        self.height = height
+        self.is_animation = is_animation
+        self.delays = delays
+        self.previews = list(previews)
+
+    def run(self, report, cache=None):
+        # Encode and write the files; report(text) announces progress
+        # cache is a PlaneCache that keeps encoded frames between saves
+        # Returns {step: ms} timings
+        timings = {}
+        cache = PlaneCache() if cache is None else cache
+        start = time.perf_counter()
+        report(f"Encoding {len(self.frames)} frame(s)...")
+        cache.update(self.frames, self.keys)
+        timings["encode"] = (time.perf_counter() - start) * 1000
+
+        # The payload is formatted from the cached planes chunk by chunk
+        start = time.perf_counter()
+        report(f"Writing {self.path}...")
+        write_atomic(self.path, lambda f: write_jt_document(
+            f, cache.iter_chunks(self.keys),
+            self.width, self.height,
+            is_animation=self.is_animation,
+            frame_count=len(self.frames),
+            delays=self.delays
+        ), binary=True)
+        timings["write"] = (time.perf_counter() - start) * 1000
+
+        start = time.perf_counter()
+        for preview_path, write in self.previews:
+            report(f"Writing {preview_path}...")
+            try:
+                write_atomic(preview_path, write, binary=True)
+                logger.info("Preview image saved as %s", preview_path)
+            except Exception:
+                logger.exception("Error saving preview image %s", preview_path)
+        if self.previews:
+            timings["previews"] = (time.perf_counter() - start) * 1000
+        return timings
+
+
+class ExportJob:
+    # Frames to write as an animated GIF or APNG (see previews.write_animation)
+    kind = "export"
+
+    def __init__(self, path, frames, animation_format="gif", delay=250, scale=1):
+        self.path = path
+        self.frames = tuple(frames)
+        self.animation_format = animation_format
+        self.delay = delay
+        self.scale = scale
+
+    def run(self, report, cache=None):
+        start = time.perf_counter()
+        report(f"Exporting {len(self.frames)} frame(s) to {self.path}...")
+        write_atomic(self.path, lambda f: write_animation(
+            f, self.frames, self.animation_format, self.delay, self.scale), binary=True)
+        return {"export": (time.perf_counter() - start) * 1000}
+
+
+class SaveWorker:
+    # Writes SaveJobs on a background thread, one at a time
+    #
+    # Only one job of each kind waits at a time: submitting while another job
+    # of the same kind is waiting replaces it, so a burst of saves writes the
+    # latest snapshot once instead of queueing up every intermediate one. Encoded frames are cached
+    # between jobs, so saving again after a small edit only encodes the
+    # frames that changed.
+    def __init__(self):
+        self.plane_cache = PlaneCache()  # only used by the worker thread
+        self.messages = queue.SimpleQueue()  # (kind, text, job, timings)
+        self._condition = threading.Condition()
+        self._pending = {}  # kind -> job, oldest first
+        self._busy = False
+        self._closed = False
+        self._thread = None
+
+    def submit(self, job):
+        # Queue a job; returns True when it replaced a job that was still waiting
+        with self._condition:
+            replaced = job.kind in self._pending
+            self._pending[job.kind] = job
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="save-worker", daemon=True)
+                self._thread.start()
+            self._condition.notify_all()
+        return replaced
+
+    @property
+    def busy(self):
+        with self._condition:
+            return self._busy or bool(self._pending)
+
+    def _run(self):
+        while True:
+            with self._condition:
+                self._condition.wait_for(lambda: self._pending or self._closed)
+                if not self._pending:
+                    return
+                job = self._pending.pop(next(iter(self._pending)))
+                self._busy = True
+            try:
+                timings = job.run(lambda text: self.messages.put(("progress", text, job, None)),
+                                  self.plane_cache)
+                self.messages.put(("done", f"File saved successfully as {job.path}", job, timings))
+            except Exception as e:
+                self.messages.put(("error", f"Error saving file: {e}", job, None))
+            finally:
+                with self._condition:
+                    self._busy = False
+                    self._condition.notify_all()
+
+    def poll(self):
+        # Messages posted since the last call
+        messages = []
+        while True:
+            try:
+                messages.append(self.messages.get_nowait())
+            except queue.Empty:
+                return messages
+
+    def wait(self, timeout=None):
+        # Block until every submitted job is written; False on timeout
+        with self._condition:
+            return self._condition.wait_for(
+                lambda: not self._pending and not self._busy, timeout)
+
+    def close(self, timeout=None):
+        # Finish the waiting job and stop the thread
+        self.wait(timeout)
+        with self._condition:
+            self._closed = True
+            self._condition.notify_all()
+        if self._thread is not None:
+            self._thread.join(timeout)
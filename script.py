@@ -1,10 +1,26 @@
 import pygame
 import pygame_gui
 import numpy as np
-import json
 import os
-from PIL import Image
-import io
+import logging
+import time
+import zlib
+from canvas import CanvasRenderer
+from frame_model import BLACK, FrameStore, color_to_index, create_frame
+from imaging import DITHER_MODES, IMAGE_EXTENSIONS, image_frame_count, iter_image_file
+from history import (ChangeGroup, FrameDelete, FrameInsert, FramesInsert, History,
+                     PixelsChange, StrokeRecorder, record_transform)
+from jt_codec import (encode_group_bytes, encode_planes, encode_v1, encode_v2,
+                      iter_decoded_frames, read_jt_file)
+from painting import Stroke, flood_region
+from playback import FrameSurfaceCache, PlaybackClock
+from previews import ANIMATION_FORMATS, PREVIEW_MODES, preview_files
+from profiling import TickProfiler
+from saving import ExportJob, SaveJob, SaveWorker
+from text_render import marquee_masks, mask_to_surface, place_mask, render_text_mask
+from transforms import identity_table, progressive_offsets, resize_canvas, transform_frames
+
+logger = logging.getLogger(__name__)
 
 class PixelArtEditor:
     def __init__(self):
@@ -55,7 +71,8 @@ class PixelArtEditor:
         
         # Global variables
         self.selected_format = "v2"  # Only v2 format now
-        self.selected_size = "16x64"  # Only 16x64 resolution
+        self.selected_size = "16x64"  # Canvas size as height x width
+        self.canvas_sizes = ["16x64", "32x128", "64x256"]
         self.start_color = "#FFFFFF"
         self.right_mouse_btn_color = "#000000"
         self.initial_pixel_size = 20
@@ -75,24 +92,68 @@ class PixelArtEditor:
         self.graffiti_type = 1
         self.ani_type = 1
         self.delays = 250
+        self.playback_clock = PlaybackClock(self.delays)
+        self.frame_cache = FrameSurfaceCache()  # pre-rendered canvas surfaces for playback
+        self.playback_prefetch = 2  # frames rendered ahead per tick while playing
         self.data_type = 1  # default to static
+        self.debug_text_render = False  # dump rendered text to debug_text_render.png
+        
+        # Incremental .jt loading state
+        self.load_dialog = None
+        self.import_dialog = None
+        self.frame_loader = None
+        self.frames_to_load = 0
         
         # Initialize canvas
         self.canvas_width = int(self.selected_size.split('x')[1])
         self.canvas_height = int(self.selected_size.split('x')[0])
         self.pixel_size = self.initial_pixel_size
         
+        # Screen area reserved for the canvas (sized for the default canvas);
+        # other canvas sizes get the largest pixel size that fits into it
+        self.canvas_area = pygame.Rect(20, 20,
+                                       self.canvas_width * self.initial_pixel_size,
+                                       self.canvas_height * self.initial_pixel_size)
+        self.pixel_size = self.fit_pixel_size()
+        
         # Color system
         self.selected_color = self.start_color
         self.right_mouse_color = self.right_mouse_btn_color
         
         # Mouse button tracking
         self.mouse_btn_global = -1  # -1 = none, 0 = left, 2 = right
-        
-        # Binary arrays for color representation
-        self.red_binary_array = []
-        self.green_binary_array = []
-        self.blue_binary_array = []
+        self.stroke = Stroke()
+        self.stroke_recorder = None
+        
+        # Undo/redo journal with a memory budget in bytes
+        self.undo_memory_budget = 16 * 1024 * 1024
+        self.history = History(self.undo_memory_budget)
+        
+        # Dirty-region rendering state
+        self.full_redraw = True
+        self.canvas_dirty = False
+        self.indicators_dirty = False
+        self.dirty_cells = set()
+        self.last_ui_state = set()
+        
+        # Binary arrays for color representation (debug view), computed lazily
+        self.debug_planes = None
+        self.debug_dirty_cells = set()
+        self.max_debug_bytes = 256  # per plane; a 32x64 frame fits completely
+        
+        # Per-tick timings and the profiling overlay (F3 toggles, F4 dumps to a file)
+        self.profiler = TickProfiler()
+        self.show_profiler = False
+        self.profiler_rect = None
+        self.profiler_font = None
+        self.profiler_surface = None
+        self.profiler_updated = 0
+        
+        # Saves are encoded and written on a background thread
+        self.save_worker = SaveWorker()
+        
+        # Canvas renderer (frame surface, scaled blit and cached grid overlay)
+        self.canvas_renderer = CanvasRenderer(self.canvas_width, self.canvas_height, self.pixel_size)
         
         # Create UI elements
         self.create_ui()
@@ -105,12 +166,13 @@ class PixelArtEditor:
         
     def initialize_pixel_arrays(self):
         # Create pixel arrays for frames
-        self.pixel_array_frames = []
+        # Frames share storage until modified (see FrameStore)
+        self.pixel_array_frames = FrameStore()
         self.pixel_array_frames.append(self.create_pixel_array(self.canvas_height, self.canvas_width, self.right_mouse_color))
         
     def create_pixel_array(self, height, width, color):
-        # Create a new pixel array with the specified color
-        return np.full((height, width), color, dtype=object)
+        # Create a new pixel array of palette indices filled with the specified color
+        return create_frame(height, width, color)
         
     def create_ui(self):
         # Canvas area
@@ -130,7 +192,7 @@ class PixelArtEditor:
         self.format_dropdown = pygame_gui.elements.UIDropDownMenu(
             options_list=["v1", "v2"],
             starting_option=self.selected_format,
-            relative_rect=pygame.Rect((self.canvas_rect.right + 20, 20),
+            relative_rect=pygame.Rect((self.canvas_area.right + 20, 20),
                                     (dropdown_width, dropdown_height)),
             manager=self.manager
         )
@@ -139,7 +201,7 @@ class PixelArtEditor:
         self.mode_dropdown = pygame_gui.elements.UIDropDownMenu(
             options_list=["static", "animation"],
             starting_option=self.current_mode,
-            relative_rect=pygame.Rect((self.canvas_rect.right + 20, 60),
+            relative_rect=pygame.Rect((self.canvas_area.right + 20, 60),
                                     (dropdown_width, dropdown_height)),
             manager=self.manager
         )
@@ -149,26 +211,35 @@ class PixelArtEditor:
         self.color_dropdown = pygame_gui.elements.UIDropDownMenu(
             options_list=color_options,
             starting_option=self.color_names[self.selected_color],
-            relative_rect=pygame.Rect((self.canvas_rect.right + 20, 100),
+            relative_rect=pygame.Rect((self.canvas_area.right + 20, 100),
                                     (dropdown_width, dropdown_height)),
             manager=self.manager
         )
         
         # Pixel size slider (moved down)
         self.pixel_size_slider = pygame_gui.elements.UIHorizontalSlider(
-            relative_rect=pygame.Rect((self.canvas_rect.right + 20, 140),
+            relative_rect=pygame.Rect((self.canvas_area.right + 20, 140),
                                     (dropdown_width, 20)),
             start_value=self.pixel_size,
-            value_range=(5, 30),
+            value_range=(1, 30),
+            manager=self.manager
+        )
+        
+        # Canvas size dropdown (height x width of the LED panel)
+        self.size_dropdown = pygame_gui.elements.UIDropDownMenu(
+            options_list=self.canvas_sizes,
+            starting_option=self.selected_size,
+            relative_rect=pygame.Rect((self.canvas_area.right + 20, 180),
+                                    (dropdown_width, dropdown_height)),
             manager=self.manager
         )
         
         # Buttons
-        button_y = 180  # Adjusted starting position
+        button_y = 220  # Below the size dropdown
         
         # Debug toggle button (now button_y is defined)
         self.debug_toggle_button = pygame_gui.elements.UIButton(
-            relative_rect=pygame.Rect((self.canvas_rect.right + 20, button_y),
+            relative_rect=pygame.Rect((self.canvas_area.right + 20, button_y),
                                     (button_width, button_height)),
             text="Toggle Debug",
             manager=self.manager
@@ -176,7 +247,7 @@ class PixelArtEditor:
         
         button_y += 40
         self.toggle_animation_mode_button = pygame_gui.elements.UIButton(
-            relative_rect=pygame.Rect((self.canvas_rect.right + 20, button_y),
+            relative_rect=pygame.Rect((self.canvas_area.right + 20, button_y),
                                     (button_width, button_height)),
             text="Toggle Animation",
             manager=self.manager
@@ -184,7 +255,7 @@ class PixelArtEditor:
         
         # Paint bucket button
         self.paint_bucket_button = pygame_gui.elements.UIButton(
-            relative_rect=pygame.Rect((self.canvas_rect.right + 20, button_y),
+            relative_rect=pygame.Rect((self.canvas_area.right + 20, button_y),
                                     (button_width, button_height)),
             text="Fill All",
             manager=self.manager
@@ -193,45 +264,122 @@ class PixelArtEditor:
         button_y += 40
         # Right mouse paint bucket button
         self.rmb_paint_bucket_button = pygame_gui.elements.UIButton(
-            relative_rect=pygame.Rect((self.canvas_rect.right + 20, button_y),
+            relative_rect=pygame.Rect((self.canvas_area.right + 20, button_y),
                                     (button_width, button_height)),
             text="Fill RMB",
             manager=self.manager
         )
         
+        button_y += 40
+        # Paint tool: freehand pen or flood fill with 4- or 8-connectivity
+        self.tool_dropdown = pygame_gui.elements.UIDropDownMenu(
+            options_list=["pen", "fill 4", "fill 8"],
+            starting_option="pen",
+            relative_rect=pygame.Rect((self.canvas_area.right + 20, button_y),
+                                    (dropdown_width, dropdown_height)),
+            manager=self.manager
+        )
+        
         button_y += 40
         # Add swap button (moved up in the UI order)
         self.swap_button = pygame_gui.elements.UIButton(
-            relative_rect=pygame.Rect((self.canvas_rect.right + 20, button_y),
+            relative_rect=pygame.Rect((self.canvas_area.right + 20, button_y),
                                     (button_width, button_height)),
             text="Swap Black",
             manager=self.manager
         )
-        print("Swap button created at position:", self.canvas_rect.right + 20, button_y)  # Debug output
+        logger.debug("Swap button created at position: %s, %s", self.canvas_area.right + 20, button_y)
+        
+        button_y += 40
+        # Palette remap: comma-separated "from>to" color pairs, "*" for every other color
+        self.remap_label = pygame_gui.elements.UILabel(
+            relative_rect=pygame.Rect((self.canvas_area.right + 20, button_y),
+                                    (button_width, button_height)),
+            text="Color Remap:",
+            manager=self.manager
+        )
+        
+        button_y += 30
+        self.remap_input = pygame_gui.elements.UITextEntryLine(
+            relative_rect=pygame.Rect((self.canvas_area.right + 20, button_y),
+                                    (button_width + 50, button_height)),
+            manager=self.manager
+        )
+        self.remap_input.set_text("red>blue, blue>black")
+        
+        button_y += 40
+        self.remap_button = pygame_gui.elements.UIButton(
+            relative_rect=pygame.Rect((self.canvas_area.right + 20, button_y),
+                                    (button_width, button_height)),
+            text="Remap Colors",
+            manager=self.manager
+        )
         
         button_y += 40
         # Load button
         self.load_button = pygame_gui.elements.UIButton(
-            relative_rect=pygame.Rect((self.canvas_rect.right + 20, button_y),
+            relative_rect=pygame.Rect((self.canvas_area.right + 20, button_y),
                                     (button_width, button_height)),
             text="Load",
             manager=self.manager
         )
         
         button_y += 40
-        # Save button
+        # Save button with the review images written next to the .jt file
         self.save_button = pygame_gui.elements.UIButton(
-            relative_rect=pygame.Rect((self.canvas_rect.right + 20, button_y),
-                                    (button_width, button_height)),
+            relative_rect=pygame.Rect((self.canvas_area.right + 20, button_y),
+                                    (80, button_height)),
             text="Save",
             manager=self.manager
         )
         
+        self.preview_dropdown = pygame_gui.elements.UIDropDownMenu(
+            options_list=list(PREVIEW_MODES),
+            starting_option="debug",
+            relative_rect=pygame.Rect((self.canvas_area.right + 105, button_y),
+                                    (85, button_height)),
+            manager=self.manager
+        )
+        
         button_y += 40
+        # Image import (PNG/GIF/APNG) with the dithering used to map it to the palette
+        self.import_button = pygame_gui.elements.UIButton(
+            relative_rect=pygame.Rect((self.canvas_area.right + 20, button_y),
+                                    (80, button_height)),
+            text="Import",
+            manager=self.manager
+        )
+        
+        self.dither_dropdown = pygame_gui.elements.UIDropDownMenu(
+            options_list=list(DITHER_MODES),
+            starting_option="none",
+            relative_rect=pygame.Rect((self.canvas_area.right + 105, button_y),
+                                    (85, button_height)),
+            manager=self.manager
+        )
+        
+        button_y += 40
+        # Animated GIF/APNG export with the pixel upscaling factor
+        self.export_button = pygame_gui.elements.UIButton(
+            relative_rect=pygame.Rect((self.canvas_area.right + 20, button_y),
+                                    (80, button_height)),
+            text="Export",
+            manager=self.manager
+        )
+        
+        self.export_dropdown = pygame_gui.elements.UIDropDownMenu(
+            options_list=[f"{animation_format} x{scale}"
+                          for animation_format in ANIMATION_FORMATS for scale in (1, 2, 4)],
+            starting_option="gif x1",
+            relative_rect=pygame.Rect((self.canvas_area.right + 105, button_y),
+                                    (85, button_height)),
+            manager=self.manager
+        )
+        
         # Add filename input field with better positioning
         button_y += 40
         self.filename_label = pygame_gui.elements.UILabel(
-            relative_rect=pygame.Rect((self.canvas_rect.right + 20, button_y),
+            relative_rect=pygame.Rect((self.canvas_area.right + 20, button_y),
                                     (button_width, button_height)),
             text="Filename:",
             manager=self.manager
@@ -239,7 +387,7 @@ class PixelArtEditor:
         
         button_y += 30
         self.filename_input = pygame_gui.elements.UITextEntryLine(
-            relative_rect=pygame.Rect((self.canvas_rect.right + 20, button_y),
+            relative_rect=pygame.Rect((self.canvas_area.right + 20, button_y),
                                     (button_width + 50, button_height)),
             manager=self.manager
         )
@@ -250,7 +398,7 @@ class PixelArtEditor:
         
         # Add text input label
         self.text_input_label = pygame_gui.elements.UILabel(
-            relative_rect=pygame.Rect((self.canvas_rect.right + 20, button_y),
+            relative_rect=pygame.Rect((self.canvas_area.right + 20, button_y),
                                     (button_width, button_height)),
             text="Text to Draw:",
             manager=self.manager
@@ -259,7 +407,7 @@ class PixelArtEditor:
         button_y += 30
         # Add text input field
         self.text_input = pygame_gui.elements.UITextEntryLine(
-            relative_rect=pygame.Rect((self.canvas_rect.right + 20, button_y),
+            relative_rect=pygame.Rect((self.canvas_area.right + 20, button_y),
                                     (button_width + 50, button_height)),
             manager=self.manager
         )
@@ -267,7 +415,7 @@ class PixelArtEditor:
         # Add font size control
         button_y += 40
         self.font_size_label = pygame_gui.elements.UILabel(
-            relative_rect=pygame.Rect((self.canvas_rect.right + 20, button_y),
+            relative_rect=pygame.Rect((self.canvas_area.right + 20, button_y),
                                     (button_width, button_height)),
             text="Font Size:",
             manager=self.manager
@@ -275,7 +423,7 @@ class PixelArtEditor:
         
         button_y += 30
         self.font_size_slider = pygame_gui.elements.UIHorizontalSlider(
-            relative_rect=pygame.Rect((self.canvas_rect.right + 20, button_y),
+            relative_rect=pygame.Rect((self.canvas_area.right + 20, button_y),
                                     (dropdown_width, 20)),
             start_value=8,
             value_range=(6, 14),
@@ -285,7 +433,7 @@ class PixelArtEditor:
         # Add letter spacing control
         button_y += 40
         self.letter_spacing_label = pygame_gui.elements.UILabel(
-            relative_rect=pygame.Rect((self.canvas_rect.right + 20, button_y),
+            relative_rect=pygame.Rect((self.canvas_area.right + 20, button_y),
                                     (button_width, button_height)),
             text="Letter Spacing:",
             manager=self.manager
@@ -293,7 +441,7 @@ class PixelArtEditor:
         
         button_y += 30
         self.letter_spacing_slider = pygame_gui.elements.UIHorizontalSlider(
-            relative_rect=pygame.Rect((self.canvas_rect.right + 20, button_y),
+            relative_rect=pygame.Rect((self.canvas_area.right + 20, button_y),
                                     (dropdown_width, 20)),
             start_value=1,
             value_range=(0, 5),
@@ -303,20 +451,55 @@ class PixelArtEditor:
         # Add draw text button
         button_y += 40
         self.draw_text_button = pygame_gui.elements.UIButton(
-            relative_rect=pygame.Rect((self.canvas_rect.right + 20, button_y),
+            relative_rect=pygame.Rect((self.canvas_area.right + 20, button_y),
                                     (button_width, button_height)),
             text="Draw Text",
             manager=self.manager
         )
         
+        # Add scrolling text (marquee) controls
+        button_y += 40
+        self.scroll_step_label = pygame_gui.elements.UILabel(
+            relative_rect=pygame.Rect((self.canvas_area.right + 20, button_y),
+                                    (button_width, button_height)),
+            text="Scroll Step:",
+            manager=self.manager
+        )
+        
+        button_y += 30
+        self.scroll_step_slider = pygame_gui.elements.UIHorizontalSlider(
+            relative_rect=pygame.Rect((self.canvas_area.right + 20, button_y),
+                                    (dropdown_width, 20)),
+            start_value=1,
+            value_range=(1, 8),
+            manager=self.manager
+        )
+        
+        button_y += 30
+        self.scroll_direction_dropdown = pygame_gui.elements.UIDropDownMenu(
+            options_list=["left", "right"],
+            starting_option="left",
+            relative_rect=pygame.Rect((self.canvas_area.right + 20, button_y),
+                                    (dropdown_width, dropdown_height)),
+            manager=self.manager
+        )
+        
+        button_y += 40
+        self.scroll_text_button = pygame_gui.elements.UIButton(
+            relative_rect=pygame.Rect((self.canvas_area.right + 20, button_y),
+                                    (button_width, button_height)),
+            text="Scroll Text",
+            manager=self.manager
+        )
+        
         # Animation controls (initially hidden)
-        animation_controls_y = self.canvas_rect.bottom + 10
+        animation_controls_y = self.canvas_area.bottom + 10
         # Make sure animation controls are within the visible screen area
         if animation_controls_y + 100 > self.screen_height:
             animation_controls_y = self.screen_height - 150
         
         self.animation_controls_rect = pygame.Rect(20, animation_controls_y,
-                                                self.canvas_rect.width, 40)
+                                                self.canvas_area.width, 40)
         
         # Back button
         self.back_button = pygame_gui.elements.UIButton(
@@ -403,6 +586,69 @@ class PixelArtEditor:
             manager=self.manager
         )
         
+        # Batch transform controls: which frames the shift/flip/mirror/rotate/
+        # invert buttons apply to, and how shifts treat the edges
+        self.transform_scope_dropdown = pygame_gui.elements.UIDropDownMenu(
+            options_list=["frame", "all", "range"],
+            starting_option="frame",
+            relative_rect=pygame.Rect((self.animation_controls_rect.left, self.animation_controls_rect.top + 50),
+                                    (90, 40)),
+            manager=self.manager
+        )
+        
+        self.transform_range_input = pygame_gui.elements.UITextEntryLine(
+            relative_rect=pygame.Rect((self.animation_controls_rect.left + 100, self.animation_controls_rect.top + 50),
+                                    (90, 40)),
+            manager=self.manager
+        )
+        self.transform_range_input.set_text("1-1")
+        
+        self.flip_button = pygame_gui.elements.UIButton(
+            relative_rect=pygame.Rect((self.animation_controls_rect.left + 400, self.animation_controls_rect.top + 50),
+                                    (40, 40)),
+            text="FLIP",
+            manager=self.manager
+        )
+        
+        self.mirror_button = pygame_gui.elements.UIButton(
+            relative_rect=pygame.Rect((self.animation_controls_rect.left + 450, self.animation_controls_rect.top + 50),
+                                    (40, 40)),
+            text="MIRR",
+            manager=self.manager
+        )
+        
+        self.rotate_button = pygame_gui.elements.UIButton(
+            relative_rect=pygame.Rect((self.animation_controls_rect.left + 500, self.animation_controls_rect.top + 50),
+                                    (40, 40)),
+            text="180",
+            manager=self.manager
+        )
+        
+        self.invert_button = pygame_gui.elements.UIButton(
+            relative_rect=pygame.Rect((self.animation_controls_rect.left + 550, self.animation_controls_rect.top + 50),
+                                    (40, 40)),
+            text="INV",
+            manager=self.manager
+        )
+        
+        # Shift edges: wrap around or shift in the RMB color
+        self.shift_edge_dropdown = pygame_gui.elements.UIDropDownMenu(
+            options_list=["wrap", "fill"],
+            starting_option="wrap",
+            relative_rect=pygame.Rect((self.animation_controls_rect.left + 600, self.animation_controls_rect.top + 50),
+                                    (70, 40)),
+            manager=self.manager
+        )
+        
+        # Shift offsets: the same for every frame, or growing by one step per frame
+        self.shift_offset_dropdown = pygame_gui.elements.UIDropDownMenu(
+            options_list=["fixed", "ramp"],
+            starting_option="fixed",
+            relative_rect=pygame.Rect((self.animation_controls_rect.left + 680, self.animation_controls_rect.top + 50),
+                                    (70, 40)),
+            manager=self.manager
+        )
+        
         # Delay input for animation
         self.delay_label = pygame_gui.elements.UILabel(
             relative_rect=pygame.Rect((self.animation_controls_rect.left + 400, self.animation_controls_rect.top),
@@ -445,7 +691,7 @@ class PixelArtEditor:
             self.status_label.set_text("Please enter text to draw")
             return
         
-        print(f"Drawing text: '{text}'")  # Debug output
+        logger.debug("Drawing text: %r", text)
         
         # Get font size and letter spacing
         try:
@@ -458,155 +704,121 @@ class PixelArtEditor:
         except:
             letter_spacing = 1
         
-        # Use pygame's font rendering directly
-        pygame.font.init()
-        
-        # Try to load Roboto Light from the TTF file
-        try:
-            # Try to load Roboto Light from the TTF file in the current directory
-            font = pygame.font.Font("Roboto-Light.ttf", font_size)
-            print("Using Roboto Light font from TTF file")
-        except Exception as e:
-            print(f"Error loading Roboto Light font: {e}")
-            try:
-                # Try Roboto Medium as a fallback
-                font = pygame.font.Font("Roboto-Medium.ttf", font_size)
-                print("Using Roboto Medium as fallback")
-            except:
-                try:
-                    # Try system Roboto
-                    font = pygame.font.SysFont("Roboto", font_size)
-                    print("Using system Roboto font")
-                except:
-                    try:
-                        # Try Arial as a fallback
-                        font = pygame.font.SysFont("Arial", font_size)
-                        print("Using Arial font (Roboto not available)")
-                    except:
-                        # Last resort - use default font
-                        font = pygame.font.Font(None, font_size)
-                        print("Using default font")
-        
-        # Create a temporary surface the size of the canvas
-        temp_surface = pygame.Surface((self.canvas_width, self.canvas_height))
-        temp_surface.fill((0, 0, 0))  # Fill with black
-        
-        # Apply letter spacing by rendering each character separately
-        if letter_spacing > 0:
-            # Calculate total width with spacing
-            total_width = 0
-            rendered_chars = []
-            
-            for char in text:
-                char_surface = font.render(char, True, (255, 255, 255), (0, 0, 0))
-                rendered_chars.append(char_surface)
-                total_width += char_surface.get_width() + letter_spacing
-            
-            # Remove the extra spacing after the last character
-            if rendered_chars:
-                total_width -= letter_spacing
-            
-            # Calculate position to center the text
-            x_pos = (self.canvas_width - total_width) // 2
-            y_pos = (self.canvas_height - rendered_chars[0].get_height()) // 2 if rendered_chars else 0
-            
-            # Ensure position is not negative
-            x_pos = max(0, x_pos)
-            y_pos = max(0, y_pos)
-            
-            # Draw each character with spacing
-            for char_surface in rendered_chars:
-                temp_surface.blit(char_surface, (x_pos, y_pos))
-                x_pos += char_surface.get_width() + letter_spacing
-                
-            print(f"Text dimensions with spacing: {total_width}x{rendered_chars[0].get_height() if rendered_chars else 0}")
-        else:
-            # Render the text normally without spacing
-            text_surface = font.render(text, True, (255, 255, 255), (0, 0, 0))
-            
-            # Calculate position to center the text
-            position = ((self.canvas_width - text_surface.get_width()) // 2, 
-                        (self.canvas_height - text_surface.get_height()) // 2)
-            
-            # Ensure position is not negative
-            position = (max(0, position[0]), max(0, position[1]))
-            
-            print(f"Text dimensions: {text_surface.get_width()}x{text_surface.get_height()}")
-            print(f"Text position: {position}")
-            
-            # Draw the text onto the temporary surface
-            temp_surface.blit(text_surface, position)
+        # Rasterize the text with cached fonts and glyph masks
+        text_ink = place_mask(render_text_mask(text, font_size, letter_spacing),
+                              self.canvas_width, self.canvas_height)
         
-        # Save debug image
-        pygame.image.save(temp_surface, "debug_text_render.png")
-        print("Saved debug image to debug_text_render.png")
+        # Save debug image (opt-in)
+        if self.debug_text_render:
+            pygame.image.save(mask_to_surface(text_ink), "debug_text_render.png")
+            logger.debug("Saved debug image to debug_text_render.png")
         
         # Get the current frame
-        current_frame = self.pixel_array_frames[self.current_frame_index]
-        
-        # Count how many pixels we change
-        pixels_changed = 0
-        
-        # Transfer pixels from the surface to the pixel array
-        for y in range(self.canvas_height):
-            for x in range(self.canvas_width):
-                # Check if we're within bounds
-                if x < temp_surface.get_width() and y < temp_surface.get_height():
-                    # Get the pixel color from the pygame surface
-                    pixel_color = temp_surface.get_at((x, y))
-                    
-                    # Check if the pixel is not black (part of the text)
-                    # Use a very low threshold to catch anti-aliased edges
-                    if pixel_color[0] > 20 or pixel_color[1] > 20 or pixel_color[2] > 20:
-                        # Set the pixel in your canvas to the selected color
-                        current_frame[y][x] = self.selected_color
-                        pixels_changed += 1
+        before = self.pixel_array_frames[self.current_frame_index].copy()
+        current_frame = self.pixel_array_frames.edit(self.current_frame_index)
+        
+        # Set the text pixels in the canvas to the selected color in one write
+        current_frame[text_ink] = color_to_index(self.selected_color)
+        pixels_changed = int(np.count_nonzero(text_ink))
+        
+        self.record_frame_edit(self.current_frame_index, before)
         
         # Update the display
-        self.draw_pixels()
+        self.invalidate_canvas()
         self.update_text_display()
         self.status_label.set_text(f"Drew text: '{text}' ({pixels_changed} pixels)")
     
 
         
-    def swap_black_pixels(self):
-            # Debug output
-        print(f"Selected color: {self.selected_color}")
-        print(f"Selected color from dropdown: {self.color_dropdown.selected_option}")
-        # Swap black pixels with selected color and non-black pixels with black
-        current_frame = self.pixel_array_frames[self.current_frame_index]
+    def create_scrolling_text(self):
+        # Append a scrolling marquee of the entered text as animation frames
+        # The text is rendered once into a wide strip; every frame is a window into it
+        text = self.text_input.get_text()
+        if not text:
+            self.status_label.set_text("Please enter text to scroll")
+            return
         
-        # Get the currently selected color (directly use self.selected_color)
-        selected_color = self.selected_color
-        selected_color_name = self.color_names.get(selected_color.upper(), "Unknown")
+        try:
+            font_size = int(self.font_size_slider.get_current_value())
+        except (TypeError, ValueError):
+            font_size = 8
+        try:
+            letter_spacing = int(self.letter_spacing_slider.get_current_value())
+        except (TypeError, ValueError):
+            letter_spacing = 1
+        step = int(self.scroll_step_slider.get_current_value())
+        direction = self.scroll_direction_dropdown.selected_option
+        if isinstance(direction, tuple):
+            direction = direction[0]
         
-        # Iterate through all pixels
-        for row_idx in range(self.canvas_height):
-            for col_idx in range(self.canvas_width):
-                # Get current pixel color (convert to uppercase for comparison)
-                current_color = current_frame[row_idx][col_idx].upper()
-                
-                # If the pixel is black, change to selected color
-                if current_color == '#000000':
-                    current_frame[row_idx][col_idx] = selected_color
-                # If the pixel is not black, change to black
-                else:
-                    current_frame[row_idx][col_idx] = '#000000'
+        # Pick up the delay from the delay input
+        self.update_frame_display()
         
-        # Update the display
-        self.draw_pixels()
+        ink = marquee_masks(render_text_mask(text, font_size, letter_spacing),
+                            self.canvas_width, self.canvas_height, step, direction)
+        frames = np.where(ink, color_to_index(self.selected_color),
+                          color_to_index(self.right_mouse_color)).astype(np.uint8)
+        
+        start = len(self.pixel_array_frames)
+        self.pixel_array_frames.extend(frames)
+        self.history.push(FramesInsert(start, [self.pixel_array_frames[i] for i in range(start, len(self.pixel_array_frames))]))
+        self.total_frames = len(self.pixel_array_frames)
+        self.current_frame_index = start
+        
+        if self.current_mode != "animation":
+            self.set_current_mode("animation")
+        self.update_frame_display()
+        self.invalidate_canvas()
         self.update_text_display()
+        self.status_label.set_text(f"Added {len(frames)} scrolling frames for '{text}' ({self.delays} ms each)")
+    
+    def swap_black_pixels(self):
+        # Swap black pixels with selected color and non-black pixels with black
+        selected_color = self.selected_color
+        selected_color_name = self.color_names.get(selected_color.upper(), "Unknown")
         
-        # Show a status message
-        self.status_label.set_text(f"Swapped black pixels with {selected_color_name} and non-black pixels to black")
+        # Black pixels become the selected color, everything else becomes black
+        swap_table = np.full(8, BLACK, dtype=np.uint8)
+        swap_table[BLACK] = color_to_index(selected_color)
+        self.apply_transform("remap", f"Swapped black and {selected_color_name} in", table=swap_table)
+    
+    def parse_remap(self, text):
+        # Build a palette lookup table from "from>to" pairs such as "red>blue, blue>black"
+        # "*>color" maps every color without a pair of its own; returns None if invalid
+        indices = {name.lower(): color_to_index(hex_code) for hex_code, name in self.color_names.items()}
+        pairs = {}
+        for pair in text.split(","):
+            if not pair.strip():
+                continue
+            source, _, target = pair.partition(">")
+            source = source.strip().rstrip("-").strip().lower()
+            target = target.strip().lower()
+            if target not in indices or (source != "*" and source not in indices):
+                return None
+            pairs[source if source == "*" else indices[source]] = indices[target]
+        if not pairs:
+            return None
+        
+        table = identity_table()
+        if "*" in pairs:
+            table[:] = pairs.pop("*")
+        for source, target in pairs.items():
+            table[source] = target
+        return table
+    
+    def remap_colors(self):
+        # Recolor the selected frames through the lookup table typed into the remap field
+        table = self.parse_remap(self.remap_input.get_text())
+        if table is None:
+            self.status_label.set_text("Enter color pairs such as red>blue, blue>black")
+            return
+        self.apply_transform("remap", "Remapped colors in", table=table)
     
     def update_animation_controls_visibility(self):
         # Show/hide animation controls based on current mode
         visible = self.current_mode == "animation"
         
-        # Print debug info
-        print(f"Setting animation controls visibility to: {visible}")
-        print(f"Current mode is: {self.current_mode}")
+        logger.debug("Setting animation controls visibility to %s (mode: %s)", visible, self.current_mode)
         
         # Force visibility for all animation controls
         try:
@@ -620,19 +832,23 @@ class PixelArtEditor:
             self.left_button.visible = visible
             self.down_button.visible = visible
             self.right_button.visible = visible
+            self.transform_scope_dropdown.visible = visible
+            self.transform_range_input.visible = visible
+            self.flip_button.visible = visible
+            self.mirror_button.visible = visible
+            self.rotate_button.visible = visible
+            self.invert_button.visible = visible
+            self.shift_edge_dropdown.visible = visible
+            self.shift_offset_dropdown.visible = visible
             self.delay_label.visible = visible
             self.delay_input.visible = visible
             self.frame_counter.visible = visible
-            
-            # Print the visibility state of one control to verify
-            print(f"Back button visibility is now: {self.back_button.visible}")
-        except Exception as e:
-            print(f"Error setting visibility: {e}")
+        except Exception:
+            logger.exception("Error setting animation controls visibility")
     
     def handle_mode_change(self):
         # Handle mode change (static/animation)
-        self.is_playing = False
-        pygame.time.set_timer(pygame.USEREVENT, 0)  # Stop any running animation
+        self.stop_playback()
         
         # Extract the mode from the dropdown selection
         # If it's a tuple, take the first element
@@ -647,9 +863,7 @@ class PixelArtEditor:
         # Update animation controls visibility
         self.update_animation_controls_visibility()
         
-        # Debug output to confirm mode change
-        print(f"Mode changed to: {self.current_mode}")
-        print(f"Animation controls should be: {'visible' if self.current_mode == 'animation' else 'hidden'}")
+        logger.debug("Mode changed to %s", self.current_mode)
     
     def handle_paint_bucket(self):
         # Fill all pixels with selected color
@@ -658,16 +872,41 @@ class PixelArtEditor:
         selected_hex = next((hex_code for hex_code, name in self.color_names.items() if name == selected_color_name), self.start_color)
         self.selected_color = selected_hex
         
+        before = self.pixel_array_frames[self.current_frame_index]
         self.pixel_array_frames[self.current_frame_index] = self.create_pixel_array(
             self.canvas_height, self.canvas_width, self.selected_color)
-        self.draw_pixels()
+        self.record_frame_edit(self.current_frame_index, before)
+        self.invalidate_canvas()
         self.update_text_display()
     
     def handle_rmb_paint_bucket(self):
         # Fill all pixels with right mouse button color
+        before = self.pixel_array_frames[self.current_frame_index]
         self.pixel_array_frames[self.current_frame_index] = self.create_pixel_array(
             self.canvas_height, self.canvas_width, self.right_mouse_color)
-        self.draw_pixels()
+        self.record_frame_edit(self.current_frame_index, before)
+        self.invalidate_canvas()
+        self.update_text_display()
+    
+    def flood_fill(self, row, col, color):
+        # Fill the contiguous region under (row, col) with a color
+        # With a frame range selected, every frame is filled from the same cell
+        frame_range = self.get_transform_range()
+        if frame_range is None:
+            return
+        connectivity = 8 if self.get_dropdown_value(self.tool_dropdown) == "fill 8" else 4
+        color_index = color_to_index(color)
+        
+        entries = []
+        for index in range(*frame_range):
+            before = self.pixel_array_frames[index]
+            region = flood_region(before, row, col, connectivity)
+            self.pixel_array_frames[index] = np.where(region, color_index, before)
+            entries.append(PixelsChange.from_frames(index, before, self.pixel_array_frames[index]))
+        entries = [entry for entry in entries if entry is not None]
+        if entries:
+            self.history.push(ChangeGroup(entries))
+        self.invalidate_canvas()
         self.update_text_display()
     
     def update_frame_display(self):
@@ -682,132 +921,310 @@ class PixelArtEditor:
         except ValueError:
             self.delays = 250  # Default if invalid
     
-    def toggle_pixel(self, row, col):
-        # Toggle pixel color based on mouse button
+    def paint_cells(self, rows, cols):
+        # Paint cells with the color of the held mouse button in one batched write
         if self.mouse_btn_global == 0:  # Left mouse button
-            # Use the already selected color (no need to look it up again)
-            self.pixel_array_frames[self.current_frame_index][row][col] = self.selected_color
-            self.draw_pixels()
-            self.update_text_display()
+            color = self.selected_color
         elif self.mouse_btn_global == 2:  # Right mouse button
-            self.pixel_array_frames[self.current_frame_index][row][col] = self.right_mouse_color
-            self.draw_pixels()
-            self.update_text_display()
-
-    def get_binary_component(self, color, position):
-        # Get binary component for a specific color
-        color = color.upper()
-        color_map = {
-            '#000000': '000',  # Black
-            '#FF0000': '001',  # Red
-            '#00FF00': '010',  # Green
-            '#FFFF00': '011',  # Yellow
-            '#0000FF': '100',  # Blue
-            '#FF00FF': '101',  # Magenta
-            '#00FFFF': '110',  # Cyan
-            '#FFFFFF': '111'   # White
-        }
-        current_color = color_map.get(color, '000')
-        # Extract the specific bit at position
-        binary_value = current_color[position] if position < len(current_color) else '0'
-        return binary_value
-
-    def update_text_display(self):
-        # Update text display with binary representation
+            color = self.right_mouse_color
+        else:
+            return
+        # A stroke that continues on another frame (playback, frame buttons)
+        # gets its own undo entry
+        if self.stroke_recorder is not None and self.stroke_recorder.frame_index != self.current_frame_index:
+            self.finish_stroke()
+        frame = self.pixel_array_frames.edit(self.current_frame_index)
+        color_index = color_to_index(color)
+        if self.stroke_recorder is None:
+            self.stroke_recorder = StrokeRecorder(self.current_frame_index, color_index)
+        self.stroke_recorder.record(frame, np.asarray(rows) * self.canvas_width + np.asarray(cols))
+        frame[rows, cols] = color_index
+        cells = list(zip(np.asarray(rows).tolist(), np.asarray(cols).tolist()))
+        self.invalidate_cells(cells)
+        self.update_text_display(cells)
+    
+    def get_cell_at(self, pos):
+        # Convert a mouse position to (row, col) canvas coordinates, or None outside the canvas
+        if not self.canvas_rect.collidepoint(pos):
+            return None
+        col = (pos[0] - self.canvas_rect.left) // self.pixel_size
+        row = (pos[1] - self.canvas_rect.top) // self.pixel_size
+        
+        # Ensure coordinates are within bounds
+        if 0 <= col < self.canvas_width and 0 <= row < self.canvas_height:
+            return row, col
+        return None
+    
+    def is_ui_at(self, pos):
+        # Whether an open file dialog or another UI element is under pos, so
+        # a click there belongs to the UI and not to the canvas
+        for dialog in (self.load_dialog, self.import_dialog):
+            if dialog is not None and dialog.alive() and dialog.rect.collidepoint(pos):
+                return True
+        return self.manager.get_hovering_any_element()
+    
+    def finish_stroke(self):
+        # Close the undo entry of the current mouse stroke
+        if self.stroke_recorder is not None:
+            self.history.push(self.stroke_recorder.finish(self.canvas_width * self.canvas_height))
+            self.stroke_recorder = None
+    
+    def record_frame_edit(self, frame_index, before):
+        # Record the pixels an operation changed in a frame so it can be undone
+        self.history.push(PixelsChange.from_frames(frame_index, before, self.pixel_array_frames[frame_index]))
+    
+    def undo(self):
+        # Revert the most recent edit
+        self.finish_stroke()
+        self.show_history_step(self.history.undo(self.pixel_array_frames), "Undo", "Nothing to undo")
+    
+    def redo(self):
+        # Re-apply the most recently undone edit
+        self.finish_stroke()
+        self.show_history_step(self.history.redo(self.pixel_array_frames), "Redo", "Nothing to redo")
+    
+    def show_history_step(self, frame_index, action, nothing_text):
+        # Jump to the frame an undo/redo touched and redraw it
+        if frame_index is None:
+            self.status_label.set_text(nothing_text)
+            return
+        self.total_frames = len(self.pixel_array_frames)
+        self.current_frame_index = frame_index
+        self.update_frame_display()
+        self.invalidate_canvas()
+        self.update_text_display()
+        self.status_label.set_text(f"{action} (frame {frame_index + 1})")
+    
+    def apply_stroke(self):
+        # Paint every cell the mouse went over since the last call
+        rows, cols = self.stroke.take_cells(self.canvas_width, self.canvas_height)
+        if len(rows):
+            self.paint_cells(rows, cols)
+    
+    def update_text_display(self, cells=None):
+        # Mark the binary representation as out of date
+        # cells limits the update to the given (row, col) pixels of the current
+        # frame; the actual work happens once per tick in refresh_text_display
+        if cells is None or self.debug_planes is None:
+            self.debug_planes = None
+            self.debug_dirty_cells.clear()
+        else:
+            self.debug_dirty_cells.update(cells)
+    
+    def refresh_text_display(self):
+        # Recompute the binary representation, only while it is visible
+        if not self.text_display.visible:
+            return
         pixel_array = self.pixel_array_frames[self.current_frame_index]
         
-        red_binary_array = []
-        green_binary_array = []
-        blue_binary_array = []
-        
-        row_length = len(pixel_array[0])
-        
-        for j in range(row_length):
-            red_binary = ''
-            green_binary = ''
-            blue_binary = ''
-            
-            for i in range(len(pixel_array)):
-                color = pixel_array[i][j]
-                red_value = self.get_binary_component(color, 2)
-                green_value = self.get_binary_component(color, 1)
-                blue_value = self.get_binary_component(color, 0)
-                
-                red_binary += red_value
-                green_binary += green_value
-                blue_binary += blue_value
-                
-                # Group every 8 bits and convert to decimal
-                if len(red_binary) == 8:
-                    red_binary_array.append(int(red_binary, 2))
-                    red_binary = ''
-                
-                if len(green_binary) == 8:
-                    green_binary_array.append(int(green_binary, 2))
-                    green_binary = ''
-                
-                if len(blue_binary) == 8:
-                    blue_binary_array.append(int(blue_binary, 2))
-                    blue_binary = ''
-        
-        # Add any remaining bits
-        if red_binary:
-            red_binary = red_binary.ljust(8, '0')
-            red_binary_array.append(int(red_binary, 2))
-        
-        if green_binary:
-            green_binary = green_binary.ljust(8, '0')
-            green_binary_array.append(int(green_binary, 2))
+        if self.debug_planes is None:
+            # Full encode of the current frame
+            self.debug_planes = encode_planes(pixel_array)
+        elif self.debug_dirty_cells:
+            # Only re-encode the bytes of the column/8-row groups that changed
+            groups = (self.canvas_height + 7) // 8
+            for row, col in {(row // 8, col) for row, col in self.debug_dirty_cells}:
+                byte_index = col * groups + row
+                for plane, value in zip(self.debug_planes, encode_group_bytes(pixel_array, col, row)):
+                    plane[byte_index] = value
+        else:
+            return
+        self.debug_dirty_cells.clear()
         
-        if blue_binary:
-            blue_binary = blue_binary.ljust(8, '0')
-            blue_binary_array.append(int(blue_binary, 2))
+        # Large canvases only list the first bytes of each plane: laying out
+        # thousands of numbers in the text box would stall every tick
+        red_binary_array, green_binary_array, blue_binary_array = (
+            plane[:self.max_debug_bytes] for plane in self.debug_planes)
+        hidden = len(self.debug_planes[0]) - len(red_binary_array)
+        more = f", ... {hidden} more" if hidden > 0 else ""
         
         # Update text display
-        red_decimal_text = f"Red: [{', '.join(map(str, red_binary_array))}]"
-        green_decimal_text = f"Green: [{', '.join(map(str, green_binary_array))}]"
-        blue_decimal_text = f"Blue: [{', '.join(map(str, blue_binary_array))}]"
-        
-        self.text_display.html_text = f"{red_decimal_text}<br><br>{green_decimal_text}<br><br>{blue_decimal_text}"
-        self.text_display.rebuild()
+        red_decimal_text = f"Red: [{', '.join(map(str, red_binary_array.tolist()))}{more}]"
+        green_decimal_text = f"Green: [{', '.join(map(str, green_binary_array.tolist()))}{more}]"
+        blue_decimal_text = f"Blue: [{', '.join(map(str, blue_binary_array.tolist()))}{more}]"
+        
+        html_text = f"{red_decimal_text}<br><br>{green_decimal_text}<br><br>{blue_decimal_text}"
+        # Skip the pygame_gui text layout when nothing visible changed
+        if html_text != self.text_display.html_text:
+            self.text_display.html_text = html_text
+            self.text_display.rebuild()
 
-    def draw_pixels(self):
-        # Draw pixels on the canvas
-        self.screen.fill(pygame.Color(self.bg_color))
-        
-        # Draw the current color indicator
-        color_indicator_rect = pygame.Rect(
-            self.canvas_rect.right + 20 + 130,
-            100,  # Adjusted to match the color dropdown position
-            30,
-            30
+    def invalidate_all(self):
+        # Repaint the whole window on the next render
+        self.full_redraw = True
+    
+    def invalidate_canvas(self):
+        # Repaint every canvas cell on the next render
+        self.canvas_dirty = True
+    
+    def invalidate_cells(self, cells):
+        # Repaint the given (row, col) canvas cells on the next render
+        self.dirty_cells.update(cells)
+    
+    def invalidate_indicators(self):
+        # Repaint the color indicators on the next render
+        self.indicators_dirty = True
+    
+    def get_color_indicator_rects(self):
+        # Rects of the left and right mouse button color indicators
+        return (
+            pygame.Rect(self.canvas_area.right + 20 + 130, 100, 30, 30),  # Matches the color dropdown position
+            pygame.Rect(self.canvas_area.right + 20 + 130, 140, 30, 30),  # Matches the slider position
         )
-        # Make sure to use the current selected color
+    
+    def draw_color_indicators(self):
+        # Draw the current color and right mouse button color indicators
+        color_indicator_rect, rmb_color_indicator_rect = self.get_color_indicator_rects()
         pygame.draw.rect(self.screen, pygame.Color(self.selected_color), color_indicator_rect)
         pygame.draw.rect(self.screen, pygame.Color('#000000'), color_indicator_rect, 1)  # Border
-        
-        # Draw the right mouse button color indicator
-        rmb_color_indicator_rect = pygame.Rect(
-            self.canvas_rect.right + 20 + 130,
-            140,  # Adjusted to match the slider position
-            30,
-            30
-        )
         pygame.draw.rect(self.screen, pygame.Color(self.right_mouse_color), rmb_color_indicator_rect)
         pygame.draw.rect(self.screen, pygame.Color('#000000'), rmb_color_indicator_rect, 1)  # Border
+    
+    def get_cell_rect(self, row, col):
+        # Screen rect of a canvas cell
+        return pygame.Rect(
+            self.canvas_rect.left + col * self.pixel_size,
+            self.canvas_rect.top + row * self.pixel_size,
+            self.pixel_size,
+            self.pixel_size
+        )
+    
+    def draw_cells_in_rect(self, area):
+        # Draw the part of the canvas overlapping a screen area
+        self.canvas_renderer.draw(self.screen, self.canvas_rect.topleft, area)
+    
+    def draw_pixels(self):
+        # Draw pixels on the canvas
+        self.screen.fill(pygame.Color(self.bg_color))
         
-        # Draw the pixel grid
-        pixel_array = self.pixel_array_frames[self.current_frame_index]
-        for row_idx, row in enumerate(pixel_array):
-            for col_idx, color in enumerate(row):
-                rect = pygame.Rect(
-                    self.canvas_rect.left + col_idx * self.pixel_size,
-                    self.canvas_rect.top + row_idx * self.pixel_size,
-                    self.pixel_size,
-                    self.pixel_size
-                )
-                pygame.draw.rect(self.screen, pygame.Color(color), rect)
-                pygame.draw.rect(self.screen, pygame.Color('#000000'), rect, 1)  # Border
+        # Draw the current color indicators
+        self.draw_color_indicators()
+        
+        # Draw the pixel grid as one scaled blit of the current frame
+        self.update_canvas_surface()
+        self.canvas_renderer.draw(self.screen, self.canvas_rect.topleft)
+    
+    def get_ui_state(self):
+        # Snapshot of what draw_ui will blit: (image checksum, rect) of every visible element
+        # pygame_gui redraws some element images in place, so compare contents, not objects
+        return {(zlib.crc32(image.get_buffer()), tuple(rect))
+                for image, rect, *_ in self.manager.get_sprite_group().visible}
+    
+    def repaint_area(self, rect):
+        # Repaint everything inside a screen rect: background, cells, indicators and UI
+        # Clipping makes sure translucent UI elements are only blended onto fresh pixels
+        self.screen.set_clip(rect)
+        with self.profiler.section("draw_pixels"):
+            self.screen.fill(pygame.Color(self.bg_color))
+            self.draw_cells_in_rect(rect)
+            if rect.collidelist(self.get_color_indicator_rects()) != -1:
+                self.draw_color_indicators()
+        with self.profiler.section("draw_ui"):
+            self.manager.draw_ui(self.screen)
+        self.screen.set_clip(None)
+    
+    def render(self):
+        # Repaint only the regions that changed and push just those to the display
+        with self.profiler.section("ui_state"):
+            ui_state = self.get_ui_state()
+        
+        if self.full_redraw:
+            with self.profiler.section("draw_pixels"):
+                self.draw_pixels()
+            with self.profiler.section("draw_ui"):
+                self.manager.draw_ui(self.screen)
+            if self.show_profiler:
+                self.profiler_rect = self.draw_profiler_overlay()
+            with self.profiler.section("display.update"):
+                pygame.display.update()
+            self.full_redraw = False
+            self.canvas_dirty = False
+            self.indicators_dirty = False
+            self.dirty_cells.clear()
+            self.last_ui_state = ui_state
+            return
+        
+        # UI elements that changed, appeared or disappeared
+        dirty_rects = [pygame.Rect(rect) for _, rect in ui_state ^ self.last_ui_state]
+        self.last_ui_state = ui_state
+        
+        if self.canvas_dirty:
+            dirty_rects.append(self.canvas_rect.copy())
+        elif self.dirty_cells:
+            # Scattered cells are merged into their bounding rect
+            cell_rects = [self.get_cell_rect(row, col) for row, col in self.dirty_cells]
+            dirty_rects.append(cell_rects[0].unionall(cell_rects[1:]))
+        
+        if self.indicators_dirty:
+            dirty_rects.extend(self.get_color_indicator_rects())
+        
+        if self.canvas_dirty:
+            with self.profiler.section("draw_pixels"):
+                self.update_canvas_surface()
+        elif self.dirty_cells:
+            with self.profiler.section("draw_pixels"):
+                self.canvas_renderer.update_frame(self.pixel_array_frames[self.current_frame_index])
+        
+        self.canvas_dirty = False
+        self.indicators_dirty = False
+        self.dirty_cells.clear()
+        
+        if dirty_rects:
+            # draw_ui walks every sprite whatever the clip, so repaint the area
+            # covering all dirty rects once instead of each rect on its own
+            self.repaint_area(dirty_rects[0].unionall(dirty_rects[1:]))
+        
+        if self.show_profiler:
+            # The overlay changes every tick; clear what a larger previous one covered
+            rect = self.draw_profiler_overlay()
+            if self.profiler_rect is not None and self.profiler_rect != rect:
+                self.repaint_area(self.profiler_rect)
+                self.screen.blit(self.profiler_surface, rect)
+                dirty_rects.append(self.profiler_rect)
+            self.profiler_rect = rect
+            dirty_rects.append(rect)
+        
+        if dirty_rects:
+            with self.profiler.section("display.update"):
+                pygame.display.update(dirty_rects)
+    
+    def toggle_profiler(self):
+        # Show or hide the FPS and timing overlay
+        self.show_profiler = not self.show_profiler
+        self.profiler_surface = None
+        self.profiler_rect = None
+        self.invalidate_all()
+    
+    def dump_profile(self):
+        # Write the recorded tick timings to downloads/profile_<timestamp>.json
+        os.makedirs("downloads", exist_ok=True)
+        filepath = os.path.join("downloads", f"profile_{time.strftime('%Y%m%d%H%M%S')}.json")
+        try:
+            self.profiler.dump(filepath)
+        except OSError as e:
+            self.status_label.set_text(f"Error saving timings: {e}")
+            return
+        self.status_label.set_text(f"Timings saved as {filepath}")
+    
+    def draw_profiler_overlay(self):
+        # Draw the timing overlay above the status line; returns the rect it covers
+        # The text is re-rendered a few times per second so it stays readable
+        now = pygame.time.get_ticks()
+        if self.profiler_surface is None or now - self.profiler_updated >= 250:
+            if self.profiler_font is None:
+                self.profiler_font = pygame.font.SysFont("monospace", 14)
+            lines = self.profiler.overlay_lines()
+            line_height = self.profiler_font.get_linesize()
+            width = max(self.profiler_font.size(line)[0] for line in lines) + 12
+            self.profiler_surface = pygame.Surface((width, line_height * len(lines) + 8))
+            self.profiler_surface.fill((0, 0, 0))
+            for index, line in enumerate(lines):
+                self.profiler_surface.blit(self.profiler_font.render(line, True, (0, 255, 0)),
+                                           (6, 4 + index * line_height))
+            self.profiler_updated = now
+        rect = self.profiler_surface.get_rect(bottomleft=(20, self.screen_height - 50))
+        self.screen.blit(self.profiler_surface, rect)
+        return rect
 
     # Animation functions
     def add_frame(self):
@@ -816,15 +1233,17 @@ class PixelArtEditor:
         self.pixel_array_frames.append(new_pixel_array)
         self.total_frames = len(self.pixel_array_frames)
         self.current_frame_index = self.total_frames - 1  # Set current frame to the newly added frame
+        self.history.push(FrameInsert(self.current_frame_index, self.pixel_array_frames[self.current_frame_index]))
         self.update_frame_display()
-        self.draw_pixels()
+        self.invalidate_canvas()
         self.update_text_display()
 
     def delete_frame(self):
         # Delete the current frame if there's more than one
         if self.total_frames > 1:
             # Remove the current frame
-            self.pixel_array_frames.pop(self.current_frame_index)
+            removed_frame = self.pixel_array_frames.pop(self.current_frame_index)
+            self.history.push(FrameDelete(self.current_frame_index, removed_frame))
             self.total_frames = len(self.pixel_array_frames)
             
             # Adjust current frame index if needed
@@ -832,88 +1251,202 @@ class PixelArtEditor:
                 self.current_frame_index = self.total_frames - 1
             
             self.update_frame_display()
-            self.draw_pixels()
+            self.invalidate_canvas()
             self.update_text_display()
 
     def copy_current_frame_to_end(self):
         # Clone the current frame and add it to the end
         if self.pixel_array_frames and self.current_frame_index >= 0:
-            current_frame = self.pixel_array_frames[self.current_frame_index]
-            new_frame = np.copy(current_frame)
-            self.pixel_array_frames.append(new_frame)
+            # The clone shares the current frame's storage until either is modified
+            self.pixel_array_frames.duplicate(self.current_frame_index)
             
             self.total_frames = len(self.pixel_array_frames)
             self.current_frame_index = self.total_frames - 1  # Set current frame to the newly added frame
+            self.history.push(FrameInsert(self.current_frame_index, self.pixel_array_frames[self.current_frame_index]))
             
             self.update_frame_display()
-            self.draw_pixels()
+            self.invalidate_canvas()
             self.update_text_display()
 
+    def get_dropdown_value(self, dropdown):
+        # Selected option of a dropdown (pygame_gui may report (text, id) tuples)
+        selected_option = dropdown.selected_option
+        if isinstance(selected_option, tuple):
+            return selected_option[0]
+        return selected_option
+    
+    def get_transform_range(self):
+        # (start, stop) of the frames the transform buttons apply to, or None
+        # when the typed range is invalid
+        # The scope controls are hidden in static mode, where only the
+        # frame on screen (the one a static save writes) is affected
+        if self.current_mode == "static":
+            return self.current_frame_index, self.current_frame_index + 1
+        scope = self.get_dropdown_value(self.transform_scope_dropdown)
+        if scope == "all":
+            return 0, len(self.pixel_array_frames)
+        if scope == "range":
+            # 1-based, inclusive range such as "3-40" (a single number is one frame)
+            first, _, last = self.transform_range_input.get_text().partition("-")
+            try:
+                start = int(first) - 1
+                stop = int(last) if last.strip() else start + 1
+            except ValueError:
+                self.status_label.set_text("Enter a frame range such as 1-10")
+                return None
+            start = max(start, 0)
+            stop = min(stop, len(self.pixel_array_frames))
+            if start >= stop:
+                self.status_label.set_text(f"Frame range must lie within 1-{len(self.pixel_array_frames)}")
+                return None
+            return start, stop
+        return self.current_frame_index, self.current_frame_index + 1
+    
+    def apply_transform(self, name, description, **options):
+        # Apply a transform from transforms.py to the selected frames in one batch
+        frame_range = self.get_transform_range()
+        if frame_range is None:
+            return
+        start, stop = frame_range
+        self.finish_stroke()
+        
+        frames = self.pixel_array_frames
+        before = np.stack([frames[index] for index in range(start, stop)])
+        after = transform_frames(before, name, **options)
+        for offset, frame in enumerate(after):
+            frames[start + offset] = frame
+        self.history.push(record_transform(start, before, after, name, options))
+        
+        self.invalidate_canvas()
+        self.update_text_display()
+        count = stop - start
+        self.status_label.set_text(f"{description} {count} frame{'s' if count != 1 else ''}")
+    
+    def shift_frames(self, rows, cols):
+        # Shift the selected frames, wrapping around or filling with the RMB color
+        wrap = self.get_dropdown_value(self.shift_edge_dropdown) == "wrap"
+        if self.get_dropdown_value(self.shift_offset_dropdown) == "ramp":
+            frame_range = self.get_transform_range()
+            if frame_range is None:
+                return
+            steps = progressive_offsets(frame_range[1] - frame_range[0])
+            rows, cols = rows * steps, cols * steps
+        self.apply_transform("shift", "Shifted", rows=rows, cols=cols, wrap=wrap,
+                             fill=color_to_index(self.right_mouse_color))
+    
     def shift_image_up(self):
-        # Shift image up by moving the first row to the end
-        if self.pixel_array_frames and self.current_frame_index >= 0:
-            current_frame = self.pixel_array_frames[self.current_frame_index]
-            first_row = current_frame[0].copy()
-            current_frame[:-1] = current_frame[1:]
-            current_frame[-1] = first_row
-            
-            self.draw_pixels()
-            self.update_text_display()
-
+        # Shift image up (the first row wraps around to the end)
+        self.shift_frames(-1, 0)
+    
     def shift_image_down(self):
-        # Shift image down by moving the last row to the beginning
-        if self.pixel_array_frames and self.current_frame_index >= 0:
-            current_frame = self.pixel_array_frames[self.current_frame_index]
-            last_row = current_frame[-1].copy()
-            current_frame[1:] = current_frame[:-1]
-            current_frame[0] = last_row
-            
-            self.draw_pixels()
-            self.update_text_display()
-
+        # Shift image down (the last row wraps around to the beginning)
+        self.shift_frames(1, 0)
+    
     def shift_image_left(self):
-        # Shift image left by moving the first column to the end
-        if self.pixel_array_frames and self.current_frame_index >= 0:
-            current_frame = self.pixel_array_frames[self.current_frame_index]
-            for row in current_frame:
-                first_element = row[0]
-                row[:-1] = row[1:]
-                row[-1] = first_element
-            
-            self.draw_pixels()
-            self.update_text_display()
-
+        # Shift image left (the first column wraps around to the end)
+        self.shift_frames(0, -1)
+    
     def shift_image_right(self):
-        # Shift image right by moving the last column to the beginning
-        if self.pixel_array_frames and self.current_frame_index >= 0:
-            current_frame = self.pixel_array_frames[self.current_frame_index]
-            for row in current_frame:
-                last_element = row[-1]
-                row[1:] = row[:-1]
-                row[0] = last_element
-            
-            self.draw_pixels()
-            self.update_text_display()
+        # Shift image right (the last column wraps around to the beginning)
+        self.shift_frames(0, 1)
+    
+    def flip_image(self):
+        # Flip the selected frames upside down
+        self.apply_transform("flip", "Flipped")
+    
+    def mirror_image(self):
+        # Mirror the selected frames left to right
+        self.apply_transform("mirror", "Mirrored")
+    
+    def rotate_image(self):
+        # Rotate the selected frames by 180 degrees
+        self.apply_transform("rotate180", "Rotated")
+    
+    def invert_image(self):
+        # Invert the colors of the selected frames
+        self.apply_transform("invert", "Inverted")
 
     def play_animation(self):
         # Start or stop animation playback
-        self.is_playing = not self.is_playing
         if self.is_playing:
-            pygame.time.set_timer(pygame.USEREVENT, self.delays)
-            # Update button text to show pause symbol
-            self.play_pause_button.set_text("Pause")
-        else:
-            # Stop the timer
-            pygame.time.set_timer(pygame.USEREVENT, 0)
-            # Update button text to show play symbol
-            self.play_pause_button.set_text("Play")
-
+            self.stop_playback()
+            return
+        self.update_frame_display()  # pick up the delay input
+        self.pixel_array_frames.compact()
+        # Forget pre-rendered frames that were edited or deleted since the last run
+        self.frame_cache.prune({(self.pixel_array_frames.content_key(index), self.pixel_size)
+                                for index in range(len(self.pixel_array_frames))})
+        self.is_playing = True
+        self.playback_clock.set_delay(self.delays)
+        self.playback_clock.start()
+        # Update button text to show pause symbol
+        self.play_pause_button.set_text("⏸")
+    
+    def stop_playback(self):
+        # Stop animation playback
+        if self.is_playing:
+            skipped = self.playback_clock.skipped
+            if skipped:
+                logger.debug("Playback skipped %d frames to keep up", skipped)
+        self.is_playing = False
+        self.playback_clock.stop()
+        # Update button text to show play symbol
+        self.play_pause_button.set_text("▶")
+        self.invalidate_canvas()  # back to the editable canvas surface
+    
+    def advance_playback(self):
+        # Show the frame that is due now, skipping frames if the loop fell behind
+        if not self.is_playing or self.current_mode != "animation" or self.total_frames < 2:
+            return
+        steps = self.playback_clock.due_frames()
+        if steps:
+            self.current_frame_index = (self.current_frame_index + steps) % self.total_frames
+            self.update_frame_display()
+            self.playback_clock.set_delay(self.delays)
+            self.invalidate_canvas()
+            self.update_text_display()
+        self.prefetch_frames()
+    
+    def prefetch_frames(self):
+        # Pre-render the next few frames into the playback cache
+        size = self.frame_cache.surface_bytes(self.canvas_renderer.scaled_surface)
+        for offset in range(1, self.playback_prefetch + 1):
+            index = (self.current_frame_index + offset) % self.total_frames
+            key = self.pixel_array_frames.content_key(index)
+            if key is None or (key, self.pixel_size) in self.frame_cache:
+                continue
+            if not self.frame_cache.has_room(size):
+                break
+            self.frame_cache.put((key, self.pixel_size),
+                                 self.canvas_renderer.render_frame(self.pixel_array_frames[index]))
+    
+    def update_canvas_surface(self):
+        # Bring the canvas renderer up to date with the current frame
+        # While playing, frames come from (and go into) the pre-rendered cache
+        frame = self.pixel_array_frames[self.current_frame_index]
+        key = self.pixel_array_frames.content_key(self.current_frame_index)
+        if not self.is_playing or key is None:
+            self.canvas_renderer.update_frame(frame)
+            return
+        key = (key, self.pixel_size)
+        surface = self.frame_cache.get(key)
+        if surface is None:
+            surface = self.canvas_renderer.render_frame(frame)
+            self.frame_cache.put(key, surface)
+        self.canvas_renderer.show(surface)
+    
+    def get_tick_rate(self):
+        # Main loop frame rate cap; playback at short delays needs finer ticks
+        if self.is_playing:
+            return min(240, max(60, 2000 // max(1, self.delays)))
+        return 60
+    
     def next_frame(self):
         # Go to next frame in animation
         if self.total_frames > 1:
             self.current_frame_index = (self.current_frame_index + 1) % self.total_frames
             self.update_frame_display()
-            self.draw_pixels()
+            self.invalidate_canvas()
             self.update_text_display()
 
     def prev_frame(self):
@@ -921,10 +1454,13 @@ class PixelArtEditor:
         if self.total_frames > 1:
             self.current_frame_index = (self.current_frame_index - 1) % self.total_frames
             self.update_frame_display()
-            self.draw_pixels()
+            self.invalidate_canvas()
             self.update_text_display()
             
     def save_jt_file(self):
+        # Make sure a file that is still loading is saved in full
+        self.finish_loading()
+        
         # Get base filename from the input field
         base_filename = self.filename_input.get_text()
         if not base_filename:
@@ -941,139 +1477,84 @@ class PixelArtEditor:
         if not filename.endswith(".jt"):
             filename += ".jt"
         
-        # Create downloads directory if it doesn't exist
-        import os
+        # Full path to the file (the save worker creates downloads/ if needed)
         downloads_dir = "downloads"
-        if not os.path.exists(downloads_dir):
-            os.makedirs(downloads_dir)
-            print(f"Created directory: {downloads_dir}")
-        
-        # Full path to the file
         filepath = os.path.join(downloads_dir, filename)
         
-        # Create the data structure based on format and mode
-        if self.current_mode == "static":
-            # Static image
-            data = [{
-                "dataType": 1,
-                "data": {
-                    "speed": 255,
-                    "mode": 1,
-                    "pixelHeight": self.canvas_height,
-                    "stayTime": 3,
-                    "graffitiData": self.get_binary_data_for_jt(),
-                    "pixelWidth": self.canvas_width,
-                    "graffitiType": 1
-                }
-            }]
-        else:
-            # Animation
-            data = [{
-                "dataType": 0,
-                "data": {
-                    "pixelWidth": self.canvas_width,
-                    "aniData": self.get_binary_data_for_jt(True),
-                    "frameNum": self.total_frames,
-                    "delays": self.delays,
-                    "aniType": 1,
-                    "pixelHeight": self.canvas_height
-                }
-            }]
-        
-        try:
-            with open(filepath, 'w') as f:
-                json.dump(data, f)
-            # Show a success message
-            self.status_label.set_text(f"File saved successfully as {filepath}")
-            print(f"File saved successfully as {filepath}")
-        except Exception as e:
-            # Show an error message
-            self.status_label.set_text(f"Error saving file: {e}")
-            print(f"Error saving file: {e}")
-        
-        # Also save a debug image of the current frame
-        try:
-            # Create a surface for the current frame
-            debug_surface = pygame.Surface((self.canvas_width, self.canvas_height))
-            debug_surface.fill((0, 0, 0))  # Fill with black
-            
-            # Draw the current frame
-            current_frame = self.pixel_array_frames[self.current_frame_index]
-            for y in range(self.canvas_height):
-                for x in range(self.canvas_width):
-                    color = current_frame[y][x]
-                    debug_surface.set_at((x, y), pygame.Color(color))
-            
-            # Save the debug image with the same timestamp
-            debug_filename = f"{base_filename}_{timestamp}.png"
-            debug_filepath = os.path.join(downloads_dir, debug_filename)
-            pygame.image.save(debug_surface, debug_filepath)
-            print(f"Debug image saved as {debug_filepath}")
-        except Exception as e:
-            print(f"Error saving debug image: {e}")
+        # Snapshot the frames; the worker encodes and writes them while
+        # editing goes on, so later edits do not end up in this file
+        is_animation = self.current_mode != "static"
+        frames = self.pixel_array_frames.snapshot()
+        keys = self.pixel_array_frames.content_keys()
+        current_index = self.current_frame_index
+        if not is_animation:
+            frames = frames[current_index:current_index + 1]
+            keys = keys[current_index:current_index + 1]
+            current_index = 0
+        
+        # Debug image of the current frame plus the review images picked
+        # in the preview dropdown, rendered by the worker as well
+        previews = preview_files(
+            os.path.join(downloads_dir, f"{base_filename}_{timestamp}"),
+            frames, current_index,
+            mode=self.get_dropdown_value(self.preview_dropdown),
+            delay=self.delays
+        )
+        job = SaveJob(
+            filepath, frames,
+            self.canvas_width, self.canvas_height,
+            is_animation=is_animation,
+            delays=self.delays,
+            keys=keys,
+            previews=previews
+        )
+        if self.save_worker.submit(job):
+            logger.info("Replaced a save that had not started yet")
+        self.status_label.set_text(f"Saving {filepath}...")
+    
+    def export_animation(self):
+        # Export the frames as an animated GIF or APNG in downloads/ (just
+        # the current frame in static mode), written by the save worker
+        self.finish_loading()
+        animation_format, scale = self.get_dropdown_value(self.export_dropdown).split(" x")
+        
+        is_animation = self.current_mode != "static"
+        frames = self.pixel_array_frames.snapshot()
+        if not is_animation:
+            frames = frames[self.current_frame_index:self.current_frame_index + 1]
+        
+        filename = self.animation_file_name if is_animation else self.image_file_name
+        if animation_format == "gif":
+            filename = os.path.splitext(filename)[0] + ".gif"
+        filepath = os.path.join("downloads", filename)
+        
+        self.save_worker.submit(ExportJob(filepath, frames, animation_format, self.delays, int(scale)))
+        self.status_label.set_text(f"Exporting {filepath}...")
+    
+    def poll_save_worker(self):
+        # Show progress and results of background saves
+        for kind, text, job, timings in self.save_worker.poll():
+            self.status_label.set_text(text)
+            if kind == "done":
+                logger.info("File saved as %s", job.path)
+                for name, elapsed in timings.items():
+                    self.profiler.record(name, elapsed)
+            elif kind == "error":
+                logger.error("Error saving file %s: %s", job.path, text)
 
     def get_binary_data_for_jt(self, is_animation=False, is_v1=False):
         # Convert pixel data to binary format for JT file
-        binary_data = []
         frames_to_process = self.pixel_array_frames if is_animation else [self.pixel_array_frames[self.current_frame_index]]
         
         if is_v1:
-            # v1 format - different binary data organization
-            for frame in frames_to_process:
-                frame_data = []
-                for row in range(self.canvas_height):
-                    for col in range(self.canvas_width):
-                        color = frame[row][col]
-                        binary = self.reverse_color_map.get(color.upper(), '000')
-                        # In v1, we store each pixel as a single byte (0-7)
-                        # Convert binary string to decimal (0-7)
-                        decimal_value = int(binary, 2)
-                        frame_data.append(decimal_value)
-                binary_data.extend(frame_data)
+            # v1 format - each pixel stored as a single byte (0-7)
+            binary_data = encode_v1(frames_to_process)
         else:
             # v2 format - match JavaScript implementation
-            red_data = []
-            green_data = []
-            blue_data = []
-            
-            # Process each frame
-            for frame_idx, frame in enumerate(frames_to_process):
-                # Process each column
-                for col in range(self.canvas_width):
-                    # Process each group of 8 rows (or less for the last group)
-                    for row_group in range(0, self.canvas_height, 8):
-                        red_byte = 0
-                        green_byte = 0
-                        blue_byte = 0
-                        
-                        # Process each bit in the group
-                        for bit in range(8):
-                            if row_group + bit < self.canvas_height:
-                                color = frame[row_group + bit][col].upper()
-                                binary = self.reverse_color_map.get(color, '000')
-                                
-                                # Set the appropriate bit if the color component is 1
-                                if binary[2] == '1':  # Red
-                                    red_byte |= (1 << (7 - bit))
-                                if binary[1] == '1':  # Green
-                                    green_byte |= (1 << (7 - bit))
-                                if binary[0] == '1':  # Blue
-                                    blue_byte |= (1 << (7 - bit))
-                        
-                        # Add the bytes to their respective arrays
-                        red_data.append(red_byte)
-                        green_data.append(green_byte)
-                        blue_data.append(blue_byte)
-            
-            # Combine all data in the correct order
-            # First all red data for all frames
-            binary_data.extend(red_data)
-            # Then all green data for all frames
-            binary_data.extend(green_data)
-            # Then all blue data for all frames
-            binary_data.extend(blue_data)
-        
-        return binary_data
+            # All red data for all frames, then all green, then all blue
+            binary_data = encode_v2(frames_to_process)
+        
+        return binary_data.tolist()
 
     def show_save_dialog(self, extension, file_type_desc):
         # Get the filename from the input field
@@ -1092,28 +1573,208 @@ class PixelArtEditor:
         return filename
 
     def show_load_dialog(self, extensions, file_type_desc):
-        # Simple dialog to get load path (in a real app, use a proper file dialog)
-        # For simplicity, just return None
-        return None
-
-    def play_animation(self):
-        # Start or stop animation playback
-        self.is_playing = not self.is_playing
-        if self.is_playing:
-            # Set a timer event that will trigger frame changes
-            # Use the delays value (in milliseconds) for the interval
-            pygame.time.set_timer(pygame.USEREVENT, self.delays)
-            # Update button text to show pause symbol
-            self.play_pause_button.set_text("⏸")
+        # Open a file dialog to pick a file to load
+        # The picked path arrives later as a UI_FILE_DIALOG_PATH_PICKED event
+        initial_path = "downloads" if os.path.isdir("downloads") else "."
+        # Opened below the canvas so it does not cover the pixels
+        return pygame_gui.windows.UIFileDialog(
+            rect=pygame.Rect(20, self.canvas_area.bottom + 20, 440, 500),
+            manager=self.manager,
+            window_title=f"Load {file_type_desc} ({extensions})",
+            initial_file_path=initial_path
+        )
+    
+    def set_current_mode(self, mode):
+        # Switch between static and animation mode and sync the mode dropdown
+        self.current_mode = mode
+        self.data_type = 0 if mode == "animation" else 1
+        
+        rect = self.mode_dropdown.relative_rect
+        self.mode_dropdown.kill()
+        self.mode_dropdown = pygame_gui.elements.UIDropDownMenu(
+            options_list=["static", "animation"],
+            starting_option=self.current_mode,
+            relative_rect=rect,
+            manager=self.manager
+        )
+        self.update_animation_controls_visibility()
+    
+    def fit_pixel_size(self):
+        # Largest pixel size (within the slider range) at which the canvas fits its area
+        fit = min(self.canvas_area.width // self.canvas_width,
+                  self.canvas_area.height // self.canvas_height)
+        return max(1, min(fit, 30))
+    
+    def set_pixel_size(self, pixel_size):
+        # Change the on-screen cell size and redraw everything
+        self.pixel_size = pixel_size
+        self.canvas_renderer.set_pixel_size(self.pixel_size)
+        # Update canvas rect
+        self.canvas_rect = pygame.Rect(self.canvas_area.left, self.canvas_area.top,
+                                       self.canvas_width * self.pixel_size,
+                                       self.canvas_height * self.pixel_size)
+        self.invalidate_all()
+    
+    def set_canvas_size(self, height, width, keep_frames=True):
+        # Switch to a height x width canvas
+        # With keep_frames the existing frames are cropped or padded (with the
+        # RMB color) at the bottom/right; the undo history is cleared either way
+        self.finish_stroke()
+        if keep_frames:
+            self.finish_loading()
+            frames = resize_canvas(np.asarray(self.pixel_array_frames), height, width,
+                                   color_to_index(self.right_mouse_color))
+            self.pixel_array_frames = FrameStore(frames)
+        self.history.clear()
+        
+        self.canvas_height = height
+        self.canvas_width = width
+        self.selected_size = f"{height}x{width}"
+        if self.selected_size not in self.canvas_sizes:
+            self.canvas_sizes.append(self.selected_size)
+        self.canvas_renderer = CanvasRenderer(width, height, self.pixel_size)
+        self.stroke = Stroke()
+        self.update_text_display()
+        
+        # Keep the size dropdown in sync (it is recreated to change its selection)
+        rect = self.size_dropdown.relative_rect
+        self.size_dropdown.kill()
+        self.size_dropdown = pygame_gui.elements.UIDropDownMenu(
+            options_list=self.canvas_sizes,
+            starting_option=self.selected_size,
+            relative_rect=rect,
+            manager=self.manager
+        )
+        pixel_size = self.fit_pixel_size()
+        self.pixel_size_slider.set_current_value(pixel_size)
+        self.set_pixel_size(pixel_size)
+    
+    def handle_size_change(self, size_text):
+        # Apply a "height x width" choice from the size dropdown
+        try:
+            height, width = (int(value) for value in size_text.lower().split("x"))
+        except ValueError:
+            self.status_label.set_text(f"Invalid canvas size: {size_text}")
+            return
+        if (height, width) == (self.canvas_height, self.canvas_width):
+            return
+        self.set_canvas_size(height, width)
+        self.status_label.set_text(f"Canvas size set to {self.selected_size}")
+    
+    def load_jt_file(self, filepath):
+        # Load a .jt file written by save_jt_file
+        # Only the first batch of frames is decoded here, the rest is
+        # decoded a batch per tick by load_pending_frames
+        try:
+            entry, payload = read_jt_file(filepath)
+            data = entry["data"]
+            width = int(data["pixelWidth"])
+            height = int(data["pixelHeight"])
+            is_animation = entry.get("dataType", 1) == 0
+            frame_count = int(data.get("frameNum", 1)) if is_animation else 1
+            if width <= 0 or height <= 0:
+                raise ValueError(f"Invalid canvas size {height}x{width}")
+            frame_loader = iter_decoded_frames(payload, width, height, frame_count)
+            first_batch = next(frame_loader)
+        except (OSError, KeyError, TypeError, ValueError, StopIteration) as e:
+            self.status_label.set_text(f"Error loading file: {e}")
+            return False
+        
+        if (width, height) != (self.canvas_width, self.canvas_height):
+            self.set_canvas_size(height, width, keep_frames=False)
+        delays = int(data.get("delays", self.delays)) if is_animation else None
+        self.replace_frames(first_batch, frame_loader, frame_count, is_animation, delays)
+        self.status_label.set_text(f"Loaded {filepath} ({self.total_frames}/{frame_count} frames)")
+        return True
+    
+    def import_image_file(self, filepath):
+        # Import a PNG/GIF/APNG file, resized to the canvas and mapped to the palette
+        # Frames are decoded and quantized a batch per tick by load_pending_frames,
+        # so long clips are never held in memory as RGBA frames
+        dither = self.get_dropdown_value(self.dither_dropdown)
+        try:
+            frame_count = image_frame_count(filepath)
+            batches = iter_image_file(filepath, self.canvas_width, self.canvas_height, dither=dither)
+            first_batch, durations = next(batches)
+        except (OSError, ValueError, StopIteration) as e:
+            self.status_label.set_text(f"Error importing image: {e}")
+            return False
+        
+        is_animation = frame_count > 1
+        delays = durations[0] if is_animation and durations[0] else None
+        self.replace_frames(first_batch, (frames for frames, _ in batches), frame_count, is_animation, delays)
+        self.status_label.set_text(f"Imported {filepath} ({self.total_frames}/{frame_count} frames)")
+        return True
+    
+    def replace_frames(self, first_batch, frame_loader, frame_count, is_animation, delays=None):
+        # Start a new document from the first decoded frames of a file
+        # frame_loader yields the remaining batches, see load_pending_frames
+        # Stop playback before replacing the frames
+        self.stop_playback()
+        self.finish_stroke()
+        
+        self.pixel_array_frames = FrameStore(first_batch)
+        self.history.clear()
+        self.total_frames = len(self.pixel_array_frames)
+        self.current_frame_index = 0
+        self.frame_loader = frame_loader if self.total_frames < frame_count else None
+        self.frames_to_load = frame_count
+        
+        if delays:
+            self.delays = int(delays)
+            self.delay_input.set_text(str(self.delays))
+        self.set_current_mode("animation" if is_animation else "static")
+        
+        self.update_frame_display()
+        self.invalidate_canvas()
+        self.update_text_display()
+    
+    def load_pending_frames(self):
+        # Decode the next batch of frames of a file that is still loading
+        if self.frame_loader is None:
+            return
+        try:
+            batch = next(self.frame_loader)
+        except StopIteration:
+            batch = None
+        except (OSError, ValueError) as e:
+            self.frame_loader = None
+            self.status_label.set_text(f"Error loading file: {e}")
+            return
+        if batch is not None:
+            self.pixel_array_frames.extend(batch)
+            self.total_frames = len(self.pixel_array_frames)
+            self.update_frame_display()
+        if batch is None or self.total_frames >= self.frames_to_load:
+            self.frame_loader = None
+            self.status_label.set_text(f"Loaded {self.total_frames} frames")
         else:
-            # Stop the timer
-            pygame.time.set_timer(pygame.USEREVENT, 0)
-            # Update button text to show play symbol
-            self.play_pause_button.set_text("▶")
-                        
+            self.status_label.set_text(f"Loading frames {self.total_frames}/{self.frames_to_load}")
+    
+    def finish_loading(self):
+        # Decode all remaining frames of a file that is still loading
+        while self.frame_loader is not None:
+            self.load_pending_frames()
+
+    def is_text_entry_focused(self):
+        # Check whether keyboard input currently goes to a text field
+        return any(isinstance(element, pygame_gui.elements.UITextEntryLine)
+                   for element in self.manager.get_focus_set() or ())
+    
     def handle_events(self):
-        time_delta = self.clock.tick(60) / 1000.0
+        time_delta = self.clock.tick(self.get_tick_rate()) / 1000.0
+        
+        with self.profiler.section("events"):
+            running = self.process_events()
+        
+        # Update pygame_gui
+        with self.profiler.section("manager.update"):
+            self.manager.update(time_delta)
         
+        return running
+    
+    def process_events(self):
+        # Handle all pending events; returns False when the window was closed
         for event in pygame.event.get():
             if event.type == pygame.QUIT:
                 return False
@@ -1136,39 +1797,62 @@ class PixelArtEditor:
                 # Update status label position
                 self.status_label.set_position((20, self.screen_height - 40))
                 self.status_label.set_dimensions((self.screen_width - 40, 30))
-            
-            # Handle animation timer event
-            elif event.type == pygame.USEREVENT:
-                if self.is_playing and self.current_mode == "animation" and self.total_frames > 1:
-                    self.next_frame()
                 
+                self.invalidate_all()
+            
+            # Window contents were lost (uncovered, restored, ...)
+            elif event.type in (pygame.VIDEOEXPOSE, pygame.WINDOWEXPOSED):
+                self.invalidate_all()
+            
+            # Profiling overlay and timing dump
+            elif event.type == pygame.KEYDOWN and event.key in (pygame.K_F3, pygame.K_F4):
+                if event.key == pygame.K_F3:
+                    self.toggle_profiler()
+                else:
+                    self.dump_profile()
+            
+            # Undo/redo shortcuts (text fields keep their own key handling)
+            elif event.type == pygame.KEYDOWN and event.mod & pygame.KMOD_CTRL and not self.is_text_entry_focused():
+                if event.key == pygame.K_z and event.mod & pygame.KMOD_SHIFT:
+                    self.redo()
+                elif event.key == pygame.K_z:
+                    self.undo()
+                elif event.key == pygame.K_y:
+                    self.redo()
+            
             # Handle mouse events
             elif event.type == pygame.MOUSEBUTTONDOWN:
                 if event.button in (1, 3):  # Left or right mouse button
+                    # Finish what the other button painted before switching colors
+                    self.apply_stroke()
+                    self.stroke.break_line()
+                    self.finish_stroke()
                     self.mouse_btn_global = 0 if event.button == 1 else 2
                     
-                    # Check if click is within canvas
-                    if self.canvas_rect.collidepoint(event.pos):
-                        # Convert mouse position to pixel coordinates
-                        x = (event.pos[0] - self.canvas_rect.left) // self.pixel_size
-                        y = (event.pos[1] - self.canvas_rect.top) // self.pixel_size
-                        
-                        # Ensure coordinates are within bounds
-                        if 0 <= x < self.canvas_width and 0 <= y < self.canvas_height:
-                            self.toggle_pixel(y, x)
+                    # Check if click is within canvas (and not on a dialog or
+                    # other UI element drawn over it)
+                    cell = None if self.is_ui_at(event.pos) else self.get_cell_at(event.pos)
+                    if cell is not None and self.get_dropdown_value(self.tool_dropdown) != "pen":
+                        color = self.selected_color if event.button == 1 else self.right_mouse_color
+                        self.flood_fill(*cell, color)
+                        self.mouse_btn_global = -1
+                    elif cell is not None:
+                        self.stroke.add_point(*cell)
             
             elif event.type == pygame.MOUSEBUTTONUP:
+                self.apply_stroke()
+                self.stroke.break_line()
+                self.finish_stroke()
                 self.mouse_btn_global = -1
             
             elif event.type == pygame.MOUSEMOTION:
-                # Handle drawing while dragging
-                if self.mouse_btn_global in (0, 2) and self.canvas_rect.collidepoint(event.pos):
-                    x = (event.pos[0] - self.canvas_rect.left) // self.pixel_size
-                    y = (event.pos[1] - self.canvas_rect.top) // self.pixel_size
-                    
-                    # Ensure coordinates are within bounds
-                    if 0 <= x < self.canvas_width and 0 <= y < self.canvas_height:
-                        self.toggle_pixel(y, x)
+                # Collect drag positions; they are painted once per tick
+                if self.mouse_btn_global in (0, 2):
+                    cell = None if self.is_ui_at(event.pos) else self.get_cell_at(event.pos)
+                    if cell is not None:
+                        self.stroke.add_point(*cell)
+                    else:
+                        self.stroke.break_line()
             
             # Handle UI events
             elif event.type == pygame_gui.UI_BUTTON_PRESSED:
@@ -1178,12 +1862,12 @@ class PixelArtEditor:
                     self.handle_rmb_paint_bucket()
                 elif event.ui_element == self.swap_button:
                     self.swap_black_pixels()
+                elif event.ui_element == self.remap_button:
+                    self.remap_colors()
                 elif event.ui_element == self.back_button:
                     self.prev_frame()
                 elif event.ui_element == self.play_pause_button:
                     self.play_animation()
-                    # Update button text
-                    self.play_pause_button.set_text("⏸" if self.is_playing else "▶")
                 elif event.ui_element == self.forward_button:
                     self.next_frame()
                 elif event.ui_element == self.plus_button:
@@ -1200,67 +1884,107 @@ class PixelArtEditor:
                     self.shift_image_left()
                 elif event.ui_element == self.right_button:
                     self.shift_image_right()
+                elif event.ui_element == self.flip_button:
+                    self.flip_image()
+                elif event.ui_element == self.mirror_button:
+                    self.mirror_image()
+                elif event.ui_element == self.rotate_button:
+                    self.rotate_image()
+                elif event.ui_element == self.invert_button:
+                    self.invert_image()
                 elif event.ui_element == self.save_button:
-                    self.save_jt_file()
+                    with self.profiler.measure("save"):
+                        self.save_jt_file()
                 elif event.ui_element == self.draw_text_button:
-                    print("Draw Text button clicked")  # Debug output
                     self.draw_text_on_canvas()
+                elif event.ui_element == self.scroll_text_button:
+                    self.create_scrolling_text()
                 elif event.ui_element == self.debug_toggle_button:
                     self.text_display.visible = not self.text_display.visible
                 elif event.ui_element == self.load_button:
-                    # Load file functionality would go here
-                    pass
+                    self.load_dialog = self.show_load_dialog(".jt", "JT files")
+                elif event.ui_element == self.export_button:
+                    self.export_animation()
+                elif event.ui_element == self.import_button:
+                    self.import_dialog = self.show_load_dialog(", ".join(IMAGE_EXTENSIONS), "images")
+            
+            elif event.type == pygame_gui.UI_FILE_DIALOG_PATH_PICKED:
+                if event.ui_element == self.load_dialog:
+                    self.load_dialog = None
+                    self.load_jt_file(event.text)
+                elif event.ui_element == self.import_dialog:
+                    self.import_dialog = None
+                    self.import_image_file(event.text)
             
             elif event.type == pygame_gui.UI_DROP_DOWN_MENU_CHANGED:
                 if event.ui_element == self.format_dropdown:
                     self.selected_format = event.text
                 elif event.ui_element == self.mode_dropdown:
                     self.handle_mode_change()
+                elif event.ui_element == self.size_dropdown:
+                    self.handle_size_change(event.text)
                 elif event.ui_element == self.color_dropdown:
                     # Convert color name to hex code
                     selected_color_name = event.text
                     selected_hex = next((hex_code for hex_code, name in self.color_names.items() if name == selected_color_name), self.start_color)
                     self.selected_color = selected_hex
                     # Redraw to update color indicators
-                    self.draw_pixels()
+                    self.invalidate_indicators()
             
             elif event.type == pygame_gui.UI_HORIZONTAL_SLIDER_MOVED:
                 if event.ui_element == self.pixel_size_slider:
-                    self.pixel_size = int(event.value)
-                    # Update canvas rect
-                    self.canvas_rect = pygame.Rect(20, 20,
-                                                self.canvas_width * self.pixel_size,
-                                                self.canvas_height * self.pixel_size)
-                    self.draw_pixels()
+                    self.set_pixel_size(int(event.value))
             
             # Process other pygame_gui events
             self.manager.process_events(event)
         
-        # Update pygame_gui
-        self.manager.update(time_delta)
+        # Paint this tick's mouse strokes in one go
+        self.apply_stroke()
         
         return True
 
     def run(self):
         # Main application loop
         running = True
-        self.draw_pixels()
+        self.invalidate_all()
         self.update_text_display()
         
         while running:
+            self.profiler.begin_tick()
+            
             # Handle events
             running = self.handle_events()
             
-            # Draw everything
-            self.draw_pixels()
-            self.manager.draw_ui(self.screen)
+            # Keep decoding a large file that is still loading
+            with self.profiler.section("loading"):
+                self.load_pending_frames()
+            
+            # Bring the debug view up to date once per tick
+            with self.profiler.section("debug_view"):
+                self.refresh_text_display()
+            
+            # Share storage of frames edited this tick with identical frames
+            with self.profiler.section("compact"):
+                self.pixel_array_frames.compact()
+            
+            # Show the next animation frame when it is due
+            with self.profiler.section("playback"):
+                self.advance_playback()
+            
+            # Report progress of background saves
+            self.poll_save_worker()
             
-            # Update display
-            pygame.display.update()
+            # Draw and push only what changed
+            self.render()
         
+        # Let a save that is still being written finish
+        self.save_worker.close()
         pygame.quit()
 
 # Create and run the application
 if __name__ == "__main__":
+    # Console log level from the LOG_LEVEL environment variable (default: WARNING)
+    logging.basicConfig(level=os.environ.get("LOG_LEVEL", "WARNING").upper(),
+                        format="%(levelname)s %(name)s: %(message)s")
     editor = PixelArtEditor()
     editor.run()
@@ -0,0 +1,84 @@
+# FrameStore must keep frames isolated from each other although identical
+# frames share storage, and must fold edited frames back into shared storage.
+#
+#   python -m pytest test_frame_model.py
+import numpy as np
+import pytest
+
+from frame_model import FrameStore, color_to_index, content_key, create_frame
+
+
+def random_frames(count, height=8, width=16, seed=0):
+    return np.random.default_rng(seed).integers(0, 8, (count, height, width), dtype=np.uint8)
+
+
+def test_color_to_index():
+    assert color_to_index('#ff0000') == 1
+    assert color_to_index('#00FFFF') == 6
+    assert color_to_index('#123456') == 0
+    assert color_to_index(13) == 5
+    assert np.array_equal(create_frame(2, 3, '#0000FF'), np.full((2, 3), 4))
+
+
+def test_frames_are_read_only_copies():
+    frames = random_frames(2)
+    store = FrameStore(frames)
+    frames[0][...] = 0
+    assert not np.array_equal(store[0], frames[0])
+    with pytest.raises(ValueError):
+        store[1][0, 0] = 1
+
+
+def test_identical_frames_share_storage():
+    frame = random_frames(1)[0]
+    store = FrameStore([frame, frame.copy(), frame])
+    assert store.unique_count == 1
+    assert store.nbytes == frame.nbytes
+    assert len({store.content_key(index) for index in range(3)}) == 1
+
+
+def test_edit_is_copy_on_write():
+    frame = random_frames(1)[0]
+    store = FrameStore([frame, frame])
+    snapshot = store.snapshot()
+    store.edit(1)[0, 0] ^= 7
+    assert store[1][0, 0] == frame[0, 0] ^ 7
+    assert np.array_equal(store[0], frame)
+    assert np.array_equal(snapshot[1], frame)
+    assert store.content_key(1) is None
+    assert store.unique_count == 2
+
+
+def test_duplicate_shares_until_edited():
+    store = FrameStore(random_frames(1))
+    store.duplicate(0)
+    store.duplicate(0, 0)
+    assert len(store) == 3 and store.unique_count == 1
+    store.edit(2)[...] = 3
+    assert np.array_equal(store[0], store[1])
+    assert (store[2] == 3).all()
+
+
+def test_compact_dedups_edited_frames():
+    frames = random_frames(2, seed=1)
+    store = FrameStore(frames)
+    store.append(frames[0] ^ 1)
+    # Edit frame 2 back into a copy of frame 0
+    store.edit(2)[...] ^= 1
+    assert store.unique_count == 3
+    keys = store.content_keys()
+    assert store.unique_count == 2
+    assert keys[0] == keys[2] == content_key(frames[0])
+    assert keys[1] == content_key(frames[1])
+    assert store.nbytes == 2 * frames[0].nbytes
+
+
+def test_pop_and_replace_release_storage():
+    frames = random_frames(3, seed=2)
+    store = FrameStore(frames)
+    popped = store.pop(1)
+    assert np.array_equal(popped, frames[1])
+    assert store.unique_count == 2
+    store[0] = frames[2]
+    assert store.unique_count == 1
+    assert np.array_equal(np.asarray(store), np.stack([frames[2], frames[2]]))
@@ -0,0 +1,167 @@
+# Undo/redo of every journal entry must restore the frames exactly, and the
+# journal must stay within its memory budget.
+#
+#   python -m pytest test_history.py
+import numpy as np
+import pytest
+
+from frame_model import FrameStore
+from history import (ChangeGroup, FrameDelete, FrameInsert, FramesInsert, History, PixelsChange,
+                     RemapChange, StrokeRecorder, record_transform)
+from transforms import transform_frames
+
+
+def random_frames(count, height=13, width=7, seed=0):
+    return np.random.default_rng(seed).integers(0, 8, (count, height, width), dtype=np.uint8)
+
+
+def assert_frames(store, expected):
+    assert len(store) == len(expected)
+    for frame, want in zip(store, expected):
+        assert np.array_equal(frame, want)
+
+
+def apply_and_record(store, start, stop, name, options):
+    # Apply a transform to the store like the editor does and return its entry
+    before = np.stack([store[index] for index in range(start, stop)])
+    after = transform_frames(before, name, **options)
+    for offset, frame in enumerate(after):
+        store[start + offset] = frame
+    return record_transform(start, before, after, name, options)
+
+
+def check_undo_redo(store, original, entry):
+    edited = [frame.copy() for frame in store]
+    history = History()
+    history.push(entry)
+    history.undo(store)
+    assert_frames(store, original)
+    history.redo(store)
+    assert_frames(store, edited)
+
+
+def test_pixels_change():
+    frames = random_frames(2)
+    store = FrameStore(frames)
+    after = frames[1].copy()
+    after[2:5, 1:4] = 7
+    entry = PixelsChange.from_frames(1, frames[1], after)
+    store.edit(1)[...] = after
+    check_undo_redo(store, frames, entry)
+    assert PixelsChange.from_frames(0, frames[0], frames[0]) is None
+
+
+def test_stroke_recorder_keeps_first_old_value():
+    frames = random_frames(1)
+    store = FrameStore(frames)
+    recorder = StrokeRecorder(0, 5)
+    frame = store.edit(0)
+    for positions in ([0, 1, 2], [2, 3], [1, 10]):
+        recorder.record(frame, positions)
+        frame.reshape(-1)[positions] = 5
+    check_undo_redo(store, frames, recorder.finish(frame.size))
+
+
+@pytest.mark.parametrize("table", [
+    [1, 0, 3, 2, 5, 4, 7, 6],  # permutation
+    [0, 0, 0, 3, 3, 5, 7, 7],  # several colors merged
+])
+def test_remap_change(table):
+    frames = random_frames(3, seed=1)
+    store = FrameStore(frames)
+    entry = RemapChange.from_frame(1, frames[1], table)
+    store.edit(1)[...] = np.asarray(table, dtype=np.uint8)[frames[1]]
+    check_undo_redo(store, frames, entry)
+
+
+@pytest.mark.parametrize("name, options", [
+    ("shift", {"rows": 3, "cols": -2}),
+    ("shift", {"rows": [1, 2, 3], "cols": 0}),
+    ("shift", {"rows": 1, "cols": 1, "wrap": False}),
+    ("flip", {}),
+    ("mirror", {}),
+    ("rotate180", {}),
+    ("invert", {}),
+    ("remap", {"table": np.array([7, 6, 5, 4, 3, 2, 1, 0], dtype=np.uint8)}),
+    ("remap", {"table": np.array([0, 0, 2, 2, 4, 4, 6, 6], dtype=np.uint8)}),
+])
+def test_transform_entries(name, options):
+    frames = random_frames(5, seed=2)
+    store = FrameStore(frames)
+    entry = apply_and_record(store, 1, 4, name, options)
+    check_undo_redo(store, frames, entry)
+
+
+def test_change_group_returns_first_frame_index():
+    frames = random_frames(4, seed=3)
+    store = FrameStore(frames)
+    entries = []
+    for index in (2, 3):
+        after = frames[index] ^ 1
+        entries.append(PixelsChange.from_frames(index, frames[index], after))
+        store[index] = after
+    group = ChangeGroup(entries)
+    assert group.undo(store) == 2
+    assert_frames(store, frames)
+    assert group.redo(store) == 2
+
+
+def test_frame_insert_and_delete():
+    frames = random_frames(3, seed=4)
+    store = FrameStore(frames)
+    new = random_frames(1, seed=5)[0]
+    store.insert(1, new)
+    check_undo_redo(store, frames, FrameInsert(1, store[1]))
+
+    store = FrameStore(frames)
+    check_undo_redo(store, frames, FrameDelete(2, store.pop(2)))
+
+    store = FrameStore(frames)
+    added = random_frames(2, seed=6)
+    for offset, frame in enumerate(added):
+        store.insert(3 + offset, frame)
+    check_undo_redo(store, frames, FramesInsert(3, added))
+
+
+def test_insert_keeps_its_own_copy():
+    frame = random_frames(1, seed=7)[0]
+    entry = FrameInsert(0, frame)
+    original = frame.copy()
+    frame[...] = 0
+    assert np.array_equal(entry.frame, original)
+
+
+def test_budget_evicts_oldest_entries():
+    frames = random_frames(1, height=32, width=32, seed=8)
+    store = FrameStore(frames)
+    entry_size = PixelsChange.from_frames(0, frames[0], frames[0] ^ 1).nbytes
+    history = History(budget=3 * entry_size)
+    for _ in range(10):
+        frame = store.edit(0)
+        history.push(PixelsChange.from_frames(0, frame, frame ^ 1))
+        frame ^= 1
+        assert history.nbytes <= history.budget
+    assert len(history.undo_stack) == 3
+    assert history.nbytes == sum(entry.nbytes for entry in history.undo_stack)
+
+    # The newest entry survives even when it alone exceeds the budget
+    history.set_budget(1)
+    assert len(history.undo_stack) == 1
+    history.undo(store)
+    assert not history.can_undo() and history.can_redo()
+
+
+def test_push_clears_redo():
+    frames = random_frames(1, seed=9)
+    store = FrameStore(frames)
+    history = History()
+    for _ in range(2):
+        frame = store.edit(0)
+        history.push(PixelsChange.from_frames(0, frame, frame ^ 2))
+        frame ^= 2
+    history.undo(store)
+    frame = store.edit(0)
+    history.push(PixelsChange.from_frames(0, frame, frame ^ 4))
+    assert not history.can_redo()
+    assert history.nbytes == sum(entry.nbytes for entry in history.undo_stack)
+    assert History().undo(store) is None
@@ -0,0 +1,76 @@
+# Regression tests for the .jt encoder: the v2 layout must stay byte for byte
+# what the JavaScript-compatible nested-loop encoder produced.
+#
+#   python -m pytest test_jt_codec.py
+import io
+import json
+
+import numpy as np
+import pytest
+
+from jt_codec import build_jt_document, decode_frames, encode_v1, encode_v2, write_jt_document
+
+
+def reference_encode_v2(frames):
+    # The original per-pixel encoder, on palette indices instead of hex strings
+    # (the 3-bit code 'bgr' of index i is format(i, '03b'))
+    red_data, green_data, blue_data = [], [], []
+    for frame in frames:
+        height, width = frame.shape
+        for col in range(width):
+            for row_group in range(0, height, 8):
+                red_byte = green_byte = blue_byte = 0
+                for bit in range(8):
+                    if row_group + bit < height:
+                        binary = format(int(frame[row_group + bit][col]), '03b')
+                        if binary[2] == '1':  # Red
+                            red_byte |= 1 << (7 - bit)
+                        if binary[1] == '1':  # Green
+                            green_byte |= 1 << (7 - bit)
+                        if binary[0] == '1':  # Blue
+                            blue_byte |= 1 << (7 - bit)
+                red_data.append(red_byte)
+                green_data.append(green_byte)
+                blue_data.append(blue_byte)
+    return red_data + green_data + blue_data
+
+
+def random_frames(count, height, width, seed=0):
+    return np.random.default_rng(seed).integers(0, 8, (count, height, width), dtype=np.uint8)
+
+
+# Heights that are not a multiple of 8 leave a partial last row group
+SIZES = [(16, 64), (32, 128), (13, 7), (5, 3), (1, 1)]
+
+
+@pytest.mark.parametrize("height, width", SIZES)
+def test_encode_v2_matches_reference(height, width):
+    frames = random_frames(3, height, width)
+    assert encode_v2(frames).tolist() == reference_encode_v2(frames)
+
+
+def test_encode_v2_single_frame():
+    frame = random_frames(1, 16, 64)[0]
+    assert encode_v2(frame).tolist() == reference_encode_v2([frame])
+
+
+@pytest.mark.parametrize("height, width", SIZES)
+def test_decode_round_trip(height, width):
+    frames = random_frames(4, height, width, seed=1)
+    assert np.array_equal(decode_frames(encode_v2(frames), width, height, len(frames)), frames)
+    assert np.array_equal(decode_frames(encode_v1(frames), width, height, len(frames)), frames)
+
+
+@pytest.mark.parametrize("is_animation", [True, False])
+@pytest.mark.parametrize("chunk_size", [1, 7, 65536])
+def test_write_jt_document_matches_json_dump(is_animation, chunk_size):
+    frames = random_frames(5 if is_animation else 1, 13, 7, seed=2)
+    data = encode_v2(frames)
+    expected = json.dumps(build_jt_document(data.tolist(), 7, 13, is_animation=is_animation,
+                                            frame_count=len(frames), delays=120))
+    # Payload split into uneven chunks, which the writer re-chunks again
+    chunks = np.array_split(data, 3)
+    f = io.BytesIO()
+    write_jt_document(f, chunks, 7, 13, is_animation=is_animation,
+                      frame_count=len(frames), delays=120, chunk_size=chunk_size)
+    assert f.getvalue().decode("ascii") == expected
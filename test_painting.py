@@ -0,0 +1,67 @@
+# The run-based flood fill must select exactly the region a plain
+# breadth-first search over pixels finds.
+#
+#   python -m pytest test_painting.py
+from collections import deque
+
+import numpy as np
+import pytest
+
+from painting import flood_region, line_cells
+
+
+def reference_flood(frame, row, col, connectivity=4):
+    # Pixel by pixel breadth-first search
+    height, width = frame.shape
+    steps = [(-1, 0), (1, 0), (0, -1), (0, 1)]
+    if connectivity == 8:
+        steps += [(-1, -1), (-1, 1), (1, -1), (1, 1)]
+    mask = np.zeros(frame.shape, dtype=bool)
+    mask[row, col] = True
+    queue = deque([(row, col)])
+    while queue:
+        r, c = queue.popleft()
+        for dr, dc in steps:
+            nr, nc = r + dr, c + dc
+            if (0 <= nr < height and 0 <= nc < width and not mask[nr, nc]
+                    and frame[nr, nc] == frame[row, col]):
+                mask[nr, nc] = True
+                queue.append((nr, nc))
+    return mask
+
+
+@pytest.mark.parametrize("connectivity", [4, 8])
+@pytest.mark.parametrize("colors", [2, 3, 8])
+@pytest.mark.parametrize("height, width", [(16, 64), (13, 7), (1, 9), (9, 1)])
+def test_flood_region_matches_bfs(height, width, colors, connectivity):
+    rng = np.random.default_rng(height * width + colors)
+    for _ in range(10):
+        frame = rng.integers(0, colors, (height, width), dtype=np.uint8)
+        row, col = int(rng.integers(height)), int(rng.integers(width))
+        assert np.array_equal(flood_region(frame, row, col, connectivity),
+                              reference_flood(frame, row, col, connectivity))
+
+
+@pytest.mark.parametrize("connectivity", [4, 8])
+def test_flood_region_spiral(connectivity):
+    # A single winding corridor needs many merge rounds
+    frame = np.ones((21, 21), dtype=np.uint8)
+    top, left, bottom, right = 0, 0, 20, 20
+    while top <= bottom and left <= right:
+        frame[top, left:right + 1] = 0
+        frame[top:bottom + 1, right] = 0
+        frame[bottom, left:right + 1] = 0
+        frame[top + 2:bottom + 1, left] = 0
+        top, left, bottom, right = top + 2, left + 2, bottom - 2, right - 2
+    for row, col in [(0, 0), (1, 1), (10, 10)]:
+        assert np.array_equal(flood_region(frame, row, col, connectivity),
+                              reference_flood(frame, row, col, connectivity))
+
+
+def test_line_cells_are_connected():
+    for row1, col1 in [(0, 9), (9, 0), (-5, 7), (3, -8), (0, 0)]:
+        rows, cols = line_cells(0, 0, row1, col1)
+        cells = list(zip(rows.tolist(), cols.tolist()))
+        assert cells[0] == (0, 0) and cells[-1] == (row1, col1)
+        for (r0, c0), (r1, c1) in zip(cells, cells[1:]):
+            assert max(abs(r1 - r0), abs(c1 - c0)) == 1
@@ -0,0 +1,78 @@
+# Batch transforms against per-frame reference implementations, and every
+# invertible transform followed by its inverse must give back the input.
+#
+#   python -m pytest test_transforms.py
+import numpy as np
+import pytest
+
+from transforms import (inverse_transform, is_permutation, progressive_offsets, resize_canvas,
+                        shift_frames, transform_frames)
+
+
+def random_frames(count, height=13, width=7, seed=0):
+    return np.random.default_rng(seed).integers(0, 8, (count, height, width), dtype=np.uint8)
+
+
+INVERTIBLE = [
+    ("shift", {"rows": 3, "cols": -5}),
+    ("shift", {"rows": progressive_offsets(4), "cols": progressive_offsets(4, -2)}),
+    ("flip", {}),
+    ("mirror", {}),
+    ("rotate180", {}),
+    ("invert", {}),
+    ("remap", {"table": np.array([3, 1, 4, 0, 5, 2, 7, 6], dtype=np.uint8)}),
+]
+
+
+@pytest.mark.parametrize("name, options", INVERTIBLE)
+def test_inverse_round_trip(name, options):
+    frames = random_frames(4)
+    inverse_name, inverse_options = inverse_transform(name, **options)
+    restored = transform_frames(transform_frames(frames, name, **options),
+                                inverse_name, **inverse_options)
+    assert np.array_equal(restored, frames)
+
+
+@pytest.mark.parametrize("name, options", [
+    ("shift", {"rows": 1, "wrap": False}),
+    ("remap", {"table": np.array([0, 0, 2, 3, 4, 5, 6, 7], dtype=np.uint8)}),
+])
+def test_lossy_transforms_have_no_inverse(name, options):
+    assert inverse_transform(name, **options) is None
+
+
+def test_shift_matches_roll():
+    frames = random_frames(3, seed=1)
+    rows, cols = [1, -2, 15], [0, 3, -8]
+    shifted = shift_frames(frames, rows, cols)
+    for frame, out, row, col in zip(frames, shifted, rows, cols):
+        assert np.array_equal(out, np.roll(frame, (row, col), axis=(0, 1)))
+
+
+def test_shift_without_wrap_fills():
+    frames = random_frames(2, seed=2)
+    shifted = shift_frames(frames, rows=2, cols=-3, wrap=False, fill=7)
+    for frame, out in zip(frames, shifted):
+        assert np.array_equal(out[2:, :-3], frame[:-2, 3:])
+        assert (out[:2] == 7).all() and (out[:, -3:] == 7).all()
+
+
+def test_geometric_transforms():
+    frames = random_frames(2, seed=3)
+    assert np.array_equal(transform_frames(frames, "flip"), frames[:, ::-1])
+    assert np.array_equal(transform_frames(frames, "mirror"), frames[:, :, ::-1])
+    assert np.array_equal(transform_frames(frames, "rotate180"), np.rot90(frames, 2, axes=(1, 2)))
+    assert np.array_equal(transform_frames(frames, "invert"), 7 - frames)
+
+
+def test_is_permutation():
+    assert is_permutation(np.arange(8))
+    assert not is_permutation([0, 0, 2, 3, 4, 5, 6, 7])
+
+
+def test_resize_canvas():
+    frames = random_frames(2, seed=4)
+    grown = resize_canvas(frames, 16, 9, fill=5)
+    assert np.array_equal(grown[:, :13, :7], frames)
+    assert (grown[:, 13:] == 5).all() and (grown[:, :, 7:] == 5).all()
+    assert np.array_equal(resize_canvas(frames, 4, 3), frames[:, :4, :3])
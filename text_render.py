@@ -0,0 +1,140 @@
+# Text rasterization for the LED canvas.
+#
+# Loaded fonts and rendered glyph masks are cached, so drawing text again
+# (or drawing a different message in the same font) only blits cached
+# boolean masks with NumPy. Masks use (row, col) indexing like frames.
+from functools import lru_cache
+import os
+
+import numpy as np
+import pygame
+
+# Fonts to try in order: (kind, name); the first one that loads is used
+FONT_FACES = (
+    ("file", "Roboto-Light.ttf"),
+    ("file", "Roboto-Medium.ttf"),
+    ("sys", "Roboto"),
+    ("sys", "Arial"),
+    ("default", None),
+)
+
+# A rendered pixel brighter than this in any channel counts as ink, which
+# also catches anti-aliased edges
+INK_THRESHOLD = 20
+
+_FONT_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+@lru_cache(maxsize=32)
+def get_font(face, size):
+    # Load a pygame font for a FONT_FACES entry (cached by face and size)
+    if not pygame.font.get_init():
+        pygame.font.init()
+    kind, name = face
+    if kind == "file":
+        path = name if os.path.exists(name) else os.path.join(_FONT_DIR, name)
+        return pygame.font.Font(path, size)
+    if kind == "sys":
+        return pygame.font.SysFont(name, size)
+    return pygame.font.Font(None, size)
+
+
+@lru_cache(maxsize=32)
+def resolve_face(size):
+    # First face of FONT_FACES that can be loaded at this size
+    for face in FONT_FACES:
+        try:
+            get_font(face, size)
+            return face
+        except (OSError, pygame.error):
+            continue
+    return FONT_FACES[-1]
+
+
+def surface_to_mask(surface):
+    # Threshold a rendered surface into a (rows, cols) boolean ink mask
+    pixels = pygame.surfarray.array3d(surface)
+    mask = (pixels > INK_THRESHOLD).any(axis=2).T
+    mask.flags.writeable = False
+    return mask
+
+
+@lru_cache(maxsize=4096)
+def glyph_mask(face, size, char):
+    # Ink mask of a single character (cached by face, size and character)
+    surface = get_font(face, size).render(char, True, (255, 255, 255), (0, 0, 0))
+    return surface_to_mask(surface)
+
+
+@lru_cache(maxsize=256)
+def text_mask(face, size, text):
+    # Ink mask of a whole string rendered in one go (keeps the font's kerning)
+    surface = get_font(face, size).render(text, True, (255, 255, 255), (0, 0, 0))
+    return surface_to_mask(surface)
+
+
+def render_text_mask(text, size, letter_spacing=0, face=None):
+    # Ink mask of a string; with letter spacing every character is placed on its own
+    face = face or resolve_face(size)
+    if letter_spacing <= 0:
+        return text_mask(face, size, text)
+    glyphs = [glyph_mask(face, size, char) for char in text]
+    if not glyphs:
+        return np.zeros((0, 0), dtype=bool)
+    height = max(glyph.shape[0] for glyph in glyphs)
+    width = sum(glyph.shape[1] for glyph in glyphs) + letter_spacing * (len(glyphs) - 1)
+    mask = np.zeros((height, width), dtype=bool)
+    x_pos = 0
+    for glyph in glyphs:
+        mask[:glyph.shape[0], x_pos:x_pos + glyph.shape[1]] = glyph
+        x_pos += glyph.shape[1] + letter_spacing
+    return mask
+
+
+def place_mask(mask, width, height):
+    # Center a mask on a width x height canvas (never above or left of the
+    # top-left corner) and clip it to the canvas
+    x_pos = max(0, (width - mask.shape[1]) // 2)
+    y_pos = max(0, (height - mask.shape[0]) // 2)
+    placed = np.zeros((height, width), dtype=bool)
+    visible = mask[:height - y_pos, :width - x_pos]
+    placed[y_pos:y_pos + visible.shape[0], x_pos:x_pos + visible.shape[1]] = visible
+    return placed
+
+
+def mask_to_surface(mask):
+    # White-on-black surface of a mask, for debug dumps
+    pixels = np.where(mask.T[:, :, np.newaxis], 255, 0).astype(np.uint8)
+    return pygame.surfarray.make_surface(np.repeat(pixels, 3, axis=2))
+
+
+def marquee_masks(mask, width, height, step=1, direction="left", loop=False):
+    # Ink masks of every frame of a scrolling text, as an (n, height, width) stack
+    #
+    # The text strip is rendered once; every frame is a window into it,
+    # gathered in a single indexing operation. Without loop the text enters
+    # from one edge and scrolls fully out of the other; with loop it wraps
+    # around so the last frame leads back into the first.
+    step = max(1, int(step))
+    y_pos = max(0, (height - mask.shape[0]) // 2)
+    rows = mask[:height - y_pos]
+    strip = np.zeros((height, rows.shape[1]), dtype=bool)
+    strip[y_pos:y_pos + rows.shape[0]] = rows
+    
+    if loop:
+        # Leave at least a canvas width of blank space between repeats
+        strip = np.concatenate([strip, np.zeros((height, width), dtype=bool)], axis=1)
+        offsets = np.arange(0, strip.shape[1], step)
+        columns = (offsets[:, np.newaxis] + np.arange(width)) % strip.shape[1]
+    else:
+        blank = np.zeros((height, width), dtype=bool)
+        strip = np.concatenate([blank, strip, blank], axis=1)
+        offsets = np.arange(0, strip.shape[1] - width + 1, step)
+        columns = offsets[:, np.newaxis] + np.arange(width)
+    
+    if direction == "right":
+        columns = columns[::-1]
+    elif direction != "left":
+        raise ValueError(f"Unknown scroll direction: {direction}")
+    # (height, n, width) -> (n, height, width)
+    return strip[:, columns].transpose(1, 0, 2)
@@ -0,0 +1,118 @@
+# Batch geometric and color transforms over stacks of frames.
+#
+# Every transform takes an (n, height, width) stack of palette-index frames
+# and returns a new stack, processing all frames in one vectorized call.
+import numpy as np
+
+from frame_model import BLACK, FRAME_DTYPE
+
+
+def per_frame(values, count):
+    # Broadcast a scalar or per-frame sequence of offsets to one value per frame
+    return np.broadcast_to(np.asarray(values, dtype=np.intp), (count,))
+
+
+def progressive_offsets(count, step=1):
+    # Offsets that grow by step for every frame: step, 2 * step, ... so the
+    # Nth frame of a range moves N steps
+    return np.arange(1, count + 1, dtype=np.intp) * step
+
+
+def shift_frames(stack, rows=0, cols=0, wrap=True, fill=BLACK):
+    # Shift frames down by rows and right by cols (negative values go up/left)
+    # rows and cols are scalars or one offset per frame. With wrap, pixels
+    # pushed off one edge come back on the other; otherwise fill is shifted in.
+    stack = np.asarray(stack)
+    count, height, width = stack.shape
+    src_rows = np.arange(height) - per_frame(rows, count)[:, np.newaxis]
+    src_cols = np.arange(width) - per_frame(cols, count)[:, np.newaxis]
+    if wrap:
+        src_rows %= height
+        src_cols %= width
+        return stack[np.arange(count)[:, np.newaxis, np.newaxis],
+                     src_rows[:, :, np.newaxis], src_cols[:, np.newaxis, :]]
+    valid = (((src_rows >= 0) & (src_rows < height))[:, :, np.newaxis]
+             & ((src_cols >= 0) & (src_cols < width))[:, np.newaxis, :])
+    shifted = stack[np.arange(count)[:, np.newaxis, np.newaxis],
+                    np.clip(src_rows, 0, height - 1)[:, :, np.newaxis],
+                    np.clip(src_cols, 0, width - 1)[:, np.newaxis, :]]
+    shifted[~valid] = fill
+    return shifted
+
+
+def flip_frames(stack):
+    # Flip frames upside down
+    return np.asarray(stack)[:, ::-1, :].copy()
+
+
+def mirror_frames(stack):
+    # Mirror frames left to right
+    return np.asarray(stack)[:, :, ::-1].copy()
+
+
+def rotate180_frames(stack):
+    # Rotate frames by 180 degrees
+    return np.asarray(stack)[:, ::-1, ::-1].copy()
+
+
+def invert_frames(stack):
+    # Replace every color by its RGB complement (black <-> white, red <-> cyan, ...)
+    return (np.asarray(stack) ^ 7).astype(FRAME_DTYPE)
+
+
+def identity_table():
+    # Palette lookup table that maps every color to itself
+    return np.arange(8, dtype=FRAME_DTYPE)
+
+
+def remap_frames(stack, table):
+    # Recolor frames through an 8-entry lookup table (new index = table[old index])
+    return np.asarray(table, dtype=FRAME_DTYPE)[np.asarray(stack)]
+
+
+def is_permutation(table):
+    # Whether a lookup table maps the 8 colors one-to-one (and can be inverted)
+    return len(np.unique(np.asarray(table))) == 8
+
+
+def resize_canvas(stack, height, width, fill=BLACK):
+    # Crop or pad frames to height x width, keeping the top-left corner in place
+    stack = np.asarray(stack)
+    resized = np.full((stack.shape[0], height, width), fill, dtype=FRAME_DTYPE)
+    rows = min(height, stack.shape[1])
+    cols = min(width, stack.shape[2])
+    resized[:, :rows, :cols] = stack[:, :rows, :cols]
+    return resized
+
+
+TRANSFORMS = {
+    "shift": shift_frames,
+    "flip": flip_frames,
+    "mirror": mirror_frames,
+    "rotate180": rotate180_frames,
+    "invert": invert_frames,
+    "remap": remap_frames,
+}
+
+
+def transform_frames(stack, name, **options):
+    # Apply a transform from TRANSFORMS by name
+    return TRANSFORMS[name](stack, **options)
+
+
+def inverse_transform(name, **options):
+    # (name, options) of the transform that undoes a transform, or None when
+    # it cannot be undone without the original pixels
+    if name == "shift":
+        if not options.get("wrap", True):
+            return None
+        inverse = dict(options)
+        inverse["rows"] = -np.asarray(options.get("rows", 0))
+        inverse["cols"] = -np.asarray(options.get("cols", 0))
+        return name, inverse
+    if name == "remap":
+        table = np.asarray(options["table"])
+        if not is_permutation(table):
+            return None
+        return name, {"table": np.argsort(table).astype(FRAME_DTYPE)}
+    return name, options